@@ -1,11 +1,33 @@
 #!/usr/bin/env python
+#
+# Changes:
+# 20261019 [v2.0]
+#   converted to Python 3 (and argparse); ranges stored in integer arrays
+#
 
-import sys
-import optparse
+import sys, os
+import re
+import stat
+import tempfile
+import warnings
+import struct
+import ast
+from concurrent.futures import \
+  ProcessPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+import heapq
+import argparse
 from bisect import bisect_left, bisect
+from array import array
+try: import numpy
+except ImportError: numpy = None
 
-UsageMsg = """%prog  [options] [number] [number]"""
-Version = "%prog 1.0"
+__version__ = "2.0"
+__doc__ = """
+Reads integral numbers and prints them as a compact list of ranges.
+
+Numbers are read from the command line, then from the input files, and then
+from standard input unless other input was present.
+"""
 
 global Debug
 Debug = 0
@@ -14,36 +36,36 @@ class ListsThenInput:
 	def __init__(self, *inputs):
 		self.bStdInputOnlyIfEmptyLists = False
 		self.InputsIter = iter(inputs)
-		if len(inputs) > 0: self.ListIter = iter(self.InputsIter.next())
+		if len(inputs) > 0: self.ListIter = iter(next(self.InputsIter))
 		else: self.ListIter = None
 		self.count = 0
-		if Debug >= 1: print "%d inputs: %s" % (len(inputs), inputs)
+		if Debug >= 1: print("%d inputs: %s" % (len(inputs), inputs))
 	# __init__()
 	
 	def ReadStdInOnEmptyInput(self, bDoThat = True):
 		self.bStdInputOnlyIfEmptyLists = bDoThat
 	
 	def __iter__(self): return self
-	def next(self):
+	def __next__(self):
 		# the internal iterators have already been initialized and they're
 		# ready to be used; unless they have expired already, and then it's None
 		
 		while self.ListIter is not None:
 			try:
-				if Debug >= 1: print "Getting next value..."
-				value = self.ListIter.next()
+				if Debug >= 1: print("Getting next value...")
+				value = next(self.ListIter)
 				self.count += 1
 				return value
 			except StopIteration:
-				if Debug >= 2: print "  (failed)"
+				if Debug >= 2: print("  (failed)")
 			# no more elements in this list, huh? what's next list?
 			try:
-				if Debug >= 1: print "Getting next iterator..."
-				self.ListIter = self.InputsIter.next()
-				if Debug >= 2: print "  (got %r)" % self.ListIter
+				if Debug >= 1: print("Getting next iterator...")
+				self.ListIter = next(self.InputsIter)
+				if Debug >= 2: print("  (got %r)" % self.ListIter)
 				continue
 			except StopIteration:
-				if Debug >= 2: print "  (failed)"
+				if Debug >= 2: print("  (failed)")
 			
 			if self.bStdInputOnlyIfEmptyLists and self.count == 0:
 				self.bStdInputOnlyIfEmptyLists = False # no more
@@ -54,7 +76,7 @@ class ListsThenInput:
 		# while
 		
 		raise StopIteration
-	# next()
+	# __next__()
 	
 	def __repr__(self):
 		return "<%s count=%d>" % (self.__class__.__name__, self.count)
@@ -63,6 +85,8 @@ class ListsThenInput:
 
 
 class SimpleRange:
+	__slots__ = ( 'lower', 'upper', )
+	
 	def __init__(self, lower = None, upper = None):
 		self.lower = lower
 		self.upper = upper
@@ -108,7 +132,7 @@ class SimpleRange:
 			return False
 		if self.lower is None: self.lower = value
 		elif self.lower != value:
-			self.upper = max(self.upper, SimpleRange.NextValue(value))
+			self.upper = max(self.getUpperLimit(), SimpleRange.NextValue(value))
 		return True
 	# Extend()
 	
@@ -120,7 +144,7 @@ class SimpleRange:
 			return True
 		if self.isDisjoint(SR): return False
 		self.lower = min(self.lower, SR.lower)
-		self.upper = max(self.upper, SimpleRange.NextValue(SR.lower), SR.upper)
+		self.upper = max(self.getUpperLimit(), SR.getUpperLimit())
 		return True
 	# Merge()
 	
@@ -133,7 +157,7 @@ class SimpleRange:
 	def __iter__(self):
 		if self.lower is None: return iter(list())
 		if self.upper is None: return iter([self.lower])
-		return iter(xrange(self.lower, self.upper))
+		return iter(range(self.lower, self.upper))
 	# __iter__()
 	
 	# comparisons are with (integral) numbers
@@ -170,113 +194,1160 @@ class SimpleRange:
 # class SimpleRange()
 
 
-if __name__ == "__main__":
+class RangeList:
+	"""Sorted list of disjoint ranges.
 	
-	Parser = optparse.OptionParser(usage=UsageMsg)
+	The ranges are stored as two columns of integers, with the lower limits and
+	the upper limits (excluded) respectively.
+	"""
+	__slots__ = ( 'lowers', 'uppers', )
 	
-	Parser.add_option("-O", "--format", dest="PrintFormat", default="linear",
-	  help="linear, sums, columnsums or columns [%default]")
-	Parser.add_option("-i", "--input", "--inputfile", dest="InputFileNames",
-	  default=[], action="append", help="read input also from this file")
-	Parser.add_option("-S", "--nostdin", dest="NoStdIn", action="store_true",
-	  default=False,
-	  help="don't read from stdin if there is no other input [%default]")
-	Parser.add_option("-d", "--debug", dest="Debug", type="int", default=0,
-	  help="verbosity level [%default]")
+	def __init__(self, lowers = (), uppers = ()):
+		self.lowers = array('q', lowers)
+		self.uppers = array('q', uppers)
+	# __init__()
 	
-	(options, Specs) = Parser.parse_args()
+	def __len__(self): return len(self.lowers)
 	
-	Debug = options.Debug
+	def __iter__(self):
+		"""Iterates through (lower, upper) limits of the ranges."""
+		return zip(self.lowers, self.uppers)
 	
-	InputFiles = []
+	def append(self, lower, upper):
+		"""Adds a range after all the others, merging it if they overlap or touch."""
+		if self.uppers and lower <= self.uppers[-1]:
+			if upper > self.uppers[-1]: self.uppers[-1] = upper
+		else:
+			self.lowers.append(lower)
+			self.uppers.append(upper)
+		# if ... else
+	# append()
 	
-	for InputFileName in options.InputFileNames:
-		if len(InputFileName) == 0 or InputFileName == '-':
-			InputFile = sys.stdin
+	def nValues(self): return sum(self.uppers) - sum(self.lowers)
+	
+	def ranges(self):
+		"""Iterates through SimpleRange objects describing the ranges."""
+		for lower, upper in zip(self.lowers, self.uppers):
+			yield SimpleRange(lower, None if upper == lower + 1 else upper)
+	# ranges()
+	
+	def boundaries(self):
+		"""Returns all the range limits, sorted, in a single array."""
+		limits = array('q', bytes(16 * len(self.lowers)))
+		limits[0::2] = self.lowers
+		limits[1::2] = self.uppers
+		return limits
+	# boundaries()
+	
+	@staticmethod
+	def FromSimpleRanges(Ranges):
+		RL = RangeList()
+		for SR in Ranges:
+			if SR.lower is not None: RL.append(SR.lower, SR.getUpperLimit())
+		return RL
+	# FromSimpleRanges()
+	
+# class RangeList
+
+
+def CombineRanges(A, B, keep):
+	"""Returns a RangeList with the values selected by keep(inA, inB).
+	
+	The two range lists are swept together through their limits, in linear
+	time and without ever expanding the ranges into their values.
+	"""
+	a, b = A.boundaries(), B.boundaries()
+	na, nb = len(a), len(b)
+	ia = ib = 0
+	Result = RangeList()
+	start = None
+	while ia < na or ib < nb:
+		if ib >= nb or (ia < na and a[ia] <= b[ib]): pos = a[ia]
+		else: pos = b[ib]
+		if ia < na and a[ia] == pos: ia += 1
+		if ib < nb and b[ib] == pos: ib += 1
+		# an odd number of limits behind us means that we are inside a range
+		if keep(ia & 1, ib & 1):
+			if start is None: start = pos
+		elif start is not None:
+			Result.append(start, pos)
+			start = None
+		# if ... else
+	# while
+	return Result
+# CombineRanges()
+
+SetOperations = {
+	'union':        lambda inA, inB: inA or inB,
+	'intersection': lambda inA, inB: inA and inB,
+	'difference':   lambda inA, inB: inA and not inB,
+	'symdiff':      lambda inA, inB: inA != inB,
+}
+
+
+################################################################################
+### Compaction engines
+###
+### An engine collects values one by one (`add()`) and then returns the sorted
+### list of merged ranges (`ranges()`).
+###
+class InsertingCompactor:
+	"""Keeps a sorted list of ranges, inserting each new value in place.
+	
+	This is the original algorithm: each insertion costs O(N) in the number of
+	ranges.
+	"""
+	def __init__(self):
+		self.Ranges = []
+	
+	def add(self, value):
+		Ranges = self.Ranges
+		
+		if Debug >= 1:
+			print("Current ranges: %r" % ", ".join([ str(SR) for SR in Ranges]))
+		
+		if len(Ranges) == 0: iRange = 0
+		else: iRange = bisect_left(Ranges, value)
+		
+		if Debug >= 2: print("Next range: #%d" % iRange)
+		
+		# lets's see if we can extend the range we found
+		if iRange < len(Ranges) and Ranges[iRange].Extend(value):
+			if Debug >= 2:
+				print("Merging to the range (now %s)" % Ranges[iRange])
+			return
+		if iRange > 0 and Ranges[iRange-1].Extend(value):
+			if Debug >= 2:
+				print("Merging to the previous range (now %s)" % Ranges[iRange-1])
+			return
+		
+		if Debug >= 2: print("Inserting a new range")
+		Ranges.insert(iRange, SimpleRange(value))
+	# add()
+	
+	def extend(self, values):
+		for value in values: self.add(value)
+	
+	def ranges(self):
+		MergedRanges = []
+		LastRange = None
+		
+		for SR in self.Ranges:
+			if Debug >= 2: print("Include %s" % SR)
+			if LastRange is None or not LastRange.Merge(SR):
+				MergedRanges.append(SR)
+				if Debug >= 1:
+					print(
+					  "-> Added: %s" % (", ".join([ str(SR) for SR in MergedRanges])))
+				LastRange = SR
+			else:
+				if Debug >= 1:
+					print(
+					  "-> Merged: %s" % (", ".join([ str(SR) for SR in MergedRanges])))
+		# for
+		return RangeList.FromSimpleRanges(MergedRanges)
+	# ranges()
+	
+# class InsertingCompactor
+
+
+class SortingCompactor:
+	"""Collects all the values in a compact array, then sorts them once and
+	run-length encodes the consecutive runs.
+	
+	Sorting is vectorized if numpy is available.
+	"""
+	def __init__(self):
+		self.values = array('q')
+	
+	def add(self, value): self.values.append(value)
+	
+	def extend(self, values):
+		if numpy is not None and isinstance(values, numpy.ndarray):
+			values = array('q', values.astype(numpy.int64).tobytes())
+		elif values.typecode != 'q': values = array('q', values)
+		self.values.extend(values)
+	# extend()
+	
+	def ranges(self):
+		if numpy is not None:
+			values = numpy.unique(numpy.frombuffer(self.values, dtype=numpy.int64))
+			if len(values) == 0: return RangeList()
+			iBreaks = numpy.flatnonzero(numpy.diff(values) != 1) + 1
+			lowers = values[numpy.r_[0, iBreaks]]
+			uppers = values[numpy.r_[iBreaks - 1, len(values) - 1]] + 1
+			return RangeList(lowers.tolist(), uppers.tolist())
+		# if numpy
+		
+		Ranges = RangeList()
+		for value in sorted(self.values): Ranges.append(value, value + 1)
+		return Ranges
+	# ranges()
+	
+# class SortingCompactor
+
+
+class BlockedCompactor:
+	"""Keeps the merged ranges sorted in blocks of limited size.
+	
+	The lower and (exclusive) upper limits of the ranges are stored in separate
+	arrays for each block. Insertions cost O(log N + BlockSize), and memory is
+	proportional to the number of ranges rather than of values, which suits
+	large unordered streams of mostly consecutive values.
+	"""
+	BlockSize = 1024
+	
+	def __init__(self):
+		self.lowers = [] # list of blocks of lower limits
+		self.uppers = [] # list of blocks of upper limits (excluded)
+		self.firsts = [] # the first lower limit of each block
+	# __init__()
+	
+	def add(self, value):
+		if not self.firsts:
+			self.lowers.append(array('q', [ value ]))
+			self.uppers.append(array('q', [ value + 1 ]))
+			self.firsts.append(value)
+			return
+		# if first value
+		
+		iBlock = max(bisect(self.firsts, value) - 1, 0)
+		lowers, uppers = self.lowers[iBlock], self.uppers[iBlock]
+		i = bisect(lowers, value) - 1 # last range starting not after value
+		
+		if i >= 0 and value < uppers[i]: return # already there
+		
+		# the next range (possibly in the next block)
+		if i + 1 < len(lowers): nextBlock, iNext = iBlock, i + 1
+		elif iBlock + 1 < len(self.lowers): nextBlock, iNext = iBlock + 1, 0
+		else: nextBlock = None
+		touchesNext = nextBlock is not None \
+		  and self.lowers[nextBlock][iNext] == value + 1
+		
+		if i >= 0 and value == uppers[i]: # extends the previous range...
+			if touchesNext: # ... and merges it with the next one
+				uppers[i] = self.uppers[nextBlock][iNext]
+				self._remove(nextBlock, iNext)
+			else: uppers[i] = value + 1
+		elif touchesNext: # extends the next range down
+			self.lowers[nextBlock][iNext] = value
+			if iNext == 0: self.firsts[nextBlock] = value
+		else: # a new range
+			lowers.insert(i + 1, value)
+			uppers.insert(i + 1, value + 1)
+			if i < 0: self.firsts[iBlock] = value
+			if len(lowers) > 2 * self.BlockSize: self._split(iBlock)
+		# if ... else
+	# add()
+	
+	def extend(self, values):
+		for value in values: self.add(value)
+	
+	def _remove(self, iBlock, i):
+		del self.lowers[iBlock][i]
+		del self.uppers[iBlock][i]
+		if not self.lowers[iBlock]:
+			del self.lowers[iBlock]
+			del self.uppers[iBlock]
+			del self.firsts[iBlock]
+		elif i == 0: self.firsts[iBlock] = self.lowers[iBlock][0]
+	# _remove()
+	
+	def _split(self, iBlock):
+		lowers, uppers = self.lowers[iBlock], self.uppers[iBlock]
+		half = len(lowers) // 2
+		self.lowers.insert(iBlock + 1, lowers[half:])
+		self.uppers.insert(iBlock + 1, uppers[half:])
+		self.firsts.insert(iBlock + 1, lowers[half])
+		del lowers[half:]
+		del uppers[half:]
+	# _split()
+	
+	def ranges(self):
+		Ranges = RangeList()
+		for lowers, uppers in zip(self.lowers, self.uppers):
+			Ranges.lowers.extend(lowers)
+			Ranges.uppers.extend(uppers)
+		# for
+		return Ranges
+	# ranges()
+	
+# class BlockedCompactor
+
+
+################################################################################
+### roaring-style bitmap containers
+###
+### Values are split into a high part (the container key) and 16 low bits
+### stored in a container of one of three kinds: a sorted array of the values
+### (sparse blocks), a 65536-bit bitmap (dense blocks) or a list of runs
+### (blocks of long contiguous ranges).
+###
+ContainerSize = 1 << 16
+
+# runs of set bits in each byte value, as (first, after last) bit positions
+ByteRuns = []
+for byte in range(256):
+	runs = []
+	for bit in range(8):
+		if not (byte >> bit) & 1: continue
+		if runs and runs[-1][1] == bit: runs[-1][1] = bit + 1
+		else: runs.append([ bit, bit + 1 ])
+	# for bit
+	ByteRuns.append(tuple(map(tuple, runs)))
+# for byte
+del byte, bit, runs
+
+NonZeroBytes = re.compile(b'[^\x00]+')
+
+
+class ArrayContainer:
+	"""Sorted array of the values in the block."""
+	__slots__ = ( 'values', )
+	
+	MaxSize = 4096 # beyond this, a bitmap takes less memory
+	
+	def __init__(self, values = ()): self.values = array('H', values)
+	
+	def __len__(self): return len(self.values)
+	
+	def __contains__(self, low):
+		i = bisect_left(self.values, low)
+		return i < len(self.values) and self.values[i] == low
+	# __contains__()
+	
+	def add(self, low):
+		"""Adds a value, and returns the container now holding the block."""
+		values = self.values
+		if not values or low > values[-1]: i = len(values)
 		else:
-			InputFile = open(InputFileName, 'r')
-		InputFiles.append(InputFile)
-	# for
+			i = bisect_left(values, low)
+			if values[i] == low: return self
+		# if ... else
+		if len(values) >= self.MaxSize:
+			# pick the cheaper among runs and bitmap
+			Runs = RunContainer.FromRuns(self.runs())
+			C = BitmapContainer.FromRuns(self.runs()) \
+			  if len(Runs) > RunContainer.MaxRuns else Runs
+			return C.add(low)
+		# if full
+		values.insert(i, low)
+		return self
+	# add()
 	
-	Ranges = []
+	def runs(self):
+		"""Iterates through the (lower, upper) ranges of values in the block."""
+		lower = upper = None
+		for low in self.values:
+			if low != upper:
+				if upper is not None: yield lower, upper
+				lower = low
+			upper = low + 1
+		# for
+		if upper is not None: yield lower, upper
+	# runs()
+	
+# class ArrayContainer
+
+
+class BitmapContainer:
+	"""One bit for each of the values of the block."""
+	__slots__ = ( 'bits', )
+	
+	def __init__(self, bits = None):
+		self.bits = bytearray(ContainerSize >> 3) if bits is None else bits
+	
+	def __len__(self):
+		return bin(int.from_bytes(self.bits, 'little')).count('1')
+	
+	def __contains__(self, low):
+		return bool((self.bits[low >> 3] >> (low & 7)) & 1)
+	
+	def add(self, low):
+		self.bits[low >> 3] |= 1 << (low & 7)
+		return self
+	# add()
+	
+	def runs(self):
+		bits = self.bits
+		lower = upper = None
+		for match in NonZeroBytes.finditer(bits):
+			for iByte in range(match.start(), match.end()):
+				base = iByte << 3
+				for first, after in ByteRuns[bits[iByte]]:
+					if upper == base + first:
+						upper = base + after
+						continue
+					if upper is not None: yield lower, upper
+					lower, upper = base + first, base + after
+				# for runs in byte
+			# for bytes
+		# for nonzero bytes
+		if upper is not None: yield lower, upper
+	# runs()
+	
+	def toInt(self): return int.from_bytes(self.bits, 'little')
+	
+	@staticmethod
+	def FromInt(value):
+		return BitmapContainer(bytearray(value.to_bytes(ContainerSize >> 3, 'little')))
+	
+	@staticmethod
+	def FromRuns(runs):
+		value = 0
+		for lower, upper in runs: value |= ((1 << (upper - lower)) - 1) << lower
+		return BitmapContainer.FromInt(value)
+	# FromRuns()
+	
+# class BitmapContainer
+
+
+class RunContainer:
+	"""Sorted, disjoint ranges of values in the block."""
+	__slots__ = ( 'lowers', 'uppers', )
+	
+	MaxRuns = 1024 # beyond this, a bitmap takes less memory
+	
+	def __init__(self):
+		self.lowers = array('i')
+		self.uppers = array('i')
+	# __init__()
+	
+	def __len__(self): return sum(self.uppers) - sum(self.lowers)
+	
+	def __contains__(self, low):
+		i = bisect(self.lowers, low) - 1
+		return i >= 0 and low < self.uppers[i]
+	
+	def add(self, low):
+		lowers, uppers = self.lowers, self.uppers
+		i = bisect(lowers, low) - 1
+		if i >= 0 and low < uppers[i]: return self # already there
+		if i >= 0 and uppers[i] == low:
+			uppers[i] += 1
+			if i + 1 < len(lowers) and lowers[i + 1] == uppers[i]:
+				uppers[i] = uppers[i + 1]
+				del lowers[i + 1], uppers[i + 1]
+			# if joint with the next
+		elif i + 1 < len(lowers) and lowers[i + 1] == low + 1:
+			lowers[i + 1] = low
+		else:
+			if len(lowers) >= self.MaxRuns:
+				return BitmapContainer.FromRuns(self.runs()).add(low)
+			lowers.insert(i + 1, low)
+			uppers.insert(i + 1, low + 1)
+		# if ... else
+		return self
+	# add()
+	
+	def runs(self): return zip(self.lowers, self.uppers)
+	
+	@staticmethod
+	def FromRuns(runs):
+		C = RunContainer()
+		for lower, upper in runs:
+			if C.uppers and lower <= C.uppers[-1]:
+				C.uppers[-1] = max(C.uppers[-1], upper)
+			else:
+				C.lowers.append(lower)
+				C.uppers.append(upper)
+		# for
+		return C
+	# FromRuns()
+	
+# class RunContainer
+
+
+def UniteContainers(A, B):
+	"""Returns a container with the union of the values of A and B."""
+	if isinstance(A, BitmapContainer) or isinstance(B, BitmapContainer):
+		ToInt = lambda C: C.toInt() if isinstance(C, BitmapContainer) \
+		  else BitmapContainer.FromRuns(C.runs()).toInt()
+		return BitmapContainer.FromInt(ToInt(A) | ToInt(B))
+	# if bitmap
+	if isinstance(A, ArrayContainer) and isinstance(B, ArrayContainer) \
+	  and len(A) + len(B) <= ArrayContainer.MaxSize:
+		return ArrayContainer(sorted(set(A.values).union(B.values)))
+	# if small arrays
+	C = RunContainer.FromRuns(heapq.merge(A.runs(), B.runs()))
+	if len(C.lowers) > RunContainer.MaxRuns:
+		C = BitmapContainer.FromRuns(C.runs())
+	return C
+# UniteContainers()
+
+
+class RoaringCompactor:
+	"""Keeps the values in roaring-style containers, one for each block of
+	65536 consecutive values.
+	
+	Adding a value costs about the same regardless of how many were added
+	before, and memory scales with the number of blocks with values in them
+	rather than with the number of values.
+	"""
+	def __init__(self):
+		self.containers = {}
+		self.lastKey = None
+		self.lastContainer = None
+	# __init__()
+	
+	def __contains__(self, value):
+		C = self.containers.get(value >> 16)
+		return C is not None and (value & 0xFFFF) in C
+	# __contains__()
+	
+	def add(self, value):
+		key, low = value >> 16, value & 0xFFFF
+		if key == self.lastKey: C = self.lastContainer
+		else:
+			C = self.containers.get(key)
+			if C is None: C = ArrayContainer()
+		NewC = C.add(low)
+		if NewC is not C or key != self.lastKey:
+			self.containers[key] = NewC
+			self.lastKey, self.lastContainer = key, NewC
+		# if
+	# add()
+	
+	def extend(self, values):
+		for value in values: self.add(value)
+	
+	def union(self, other):
+		"""Adds to this object all the values in the other one."""
+		for key, C in other.containers.items():
+			Mine = self.containers.get(key)
+			self.containers[key] = C if Mine is None else UniteContainers(Mine, C)
+		# for
+		self.lastKey = self.lastContainer = None
+		return self
+	# union()
 	
-	InputIter = ListsThenInput(Specs, *InputFiles)
-	InputIter.ReadStdInOnEmptyInput(not options.NoStdIn)
+	def ranges(self):
+		Ranges = RangeList()
+		for key in sorted(self.containers):
+			base = key << 16
+			for lower, upper in self.containers[key].runs():
+				Ranges.append(base + lower, base + upper)
+		# for
+		return Ranges
+	# ranges()
 	
-	for iLine, line in enumerate(InputIter):
+# class RoaringCompactor
+
+
+Engines = {
+	'sort': SortingCompactor,
+	'blocked': BlockedCompactor,
+	'insert': InsertingCompactor,
+	'roaring': RoaringCompactor,
+}
+DefaultEngine = 'sort'
+
+
+def PrintRanges(Ranges, PrintFormat = "linear", out = sys.stdout):
+	"""Prints the ranges (a RangeList) in the specified format."""
+	if PrintFormat == "sums":
+		print("%d merged values: %s" % (Ranges.nValues(),
+		  ", ".join([ "%s (%d)" % (SR, len(SR)) for SR in Ranges.ranges() ])),
+		  file=out)
+	elif PrintFormat == "linear":
+		print("Merged values: %s"
+		  % ", ".join([ str(SR) for SR in Ranges.ranges() ]), file=out)
+	elif PrintFormat == "columnsums":
+		for lower, upper in Ranges:
+			if upper == lower + 1: print(1, lower, file=out)
+			else: print(upper - lower, lower, upper - 1, file=out)
+		# for
+	else:
+		for lower, upper in Ranges:
+			if upper == lower + 1: print(lower, file=out)
+			else: print(lower, upper - 1, file=out)
+		# for
+	# if ... else
+# PrintRanges()
+
+
+################################################################################
+### binary range list formats
+###
+### varint: magic, number of ranges, and then for each range the distance of
+###   its lower limit from the upper limit of the previous range (or from 0),
+###   and its length; all as LEB128 varints, the distances zigzag-encoded
+### npy:    NumPy array with shape (N, 2) of 64-bit little endian integers,
+###   with the lower limit and upper limit (excluded) of each range
+###
+VarintMagic = b'CIRANGES\x01'
+NpyMagic = b'\x93NUMPY'
+BinaryOutputFormats = ( 'varint', 'npy', )
+
+def AppendVarint(buf, value):
+	"""Appends the non-negative value to buf as LEB128 varint."""
+	while value >= 0x80:
+		buf.append((value & 0x7F) | 0x80)
+		value >>= 7
+	# while
+	buf.append(value)
+# AppendVarint()
+
+
+def EncodeVarintRanges(Ranges):
+	buf = bytearray(VarintMagic)
+	AppendVarint(buf, len(Ranges))
+	last = 0
+	for lower, upper in Ranges:
+		delta = lower - last
+		AppendVarint(buf, 2 * delta if delta >= 0 else -2 * delta - 1)
+		AppendVarint(buf, upper - lower)
+		last = upper
+	# for
+	return bytes(buf)
+# EncodeVarintRanges()
+
+
+def DecodeVarintRanges(data):
+	if not data.startswith(VarintMagic):
+		raise ValueError("not a varint range list")
+	values = []
+	value = shift = 0
+	for byte in memoryview(data)[len(VarintMagic):]:
+		value |= (byte & 0x7F) << shift
+		if byte & 0x80: shift += 7
+		else:
+			values.append(value)
+			value = shift = 0
+		# if ... else
+	# for
+	if shift or not values or len(values) != 1 + 2 * values[0]:
+		raise ValueError("truncated or corrupted varint range list")
+	Ranges = RangeList()
+	last = 0
+	for iRange in range(values[0]):
+		zigzag, length = values[1 + 2 * iRange], values[2 + 2 * iRange]
+		lower = last + ((zigzag >> 1) if not zigzag & 1 else -((zigzag + 1) >> 1))
+		last = lower + length
+		Ranges.append(lower, last)
+	# for
+	return Ranges
+# DecodeVarintRanges()
+
+
+def EncodeNpyRanges(Ranges):
+	header = "{'descr': '<i8', 'fortran_order': False, 'shape': (%d, 2), }" \
+	  % len(Ranges)
+	# total header size must be a multiple of 64, ending with a new line
+	header += ' ' * (63 - (len(NpyMagic) + 4 + len(header)) % 64) + '\n'
+	limits = Ranges.boundaries()
+	if sys.byteorder != 'little': limits.byteswap()
+	return NpyMagic + b'\x01\x00' + struct.pack('<H', len(header)) \
+	  + header.encode('latin1') + limits.tobytes()
+# EncodeNpyRanges()
+
+
+def DecodeNpyRanges(data):
+	if not data.startswith(NpyMagic):
+		raise ValueError("not a NumPy file")
+	major = data[len(NpyMagic)]
+	if major == 1:
+		headerLength, = struct.unpack_from('<H', data, len(NpyMagic) + 2)
+		iData = len(NpyMagic) + 4 + headerLength
+	else:
+		headerLength, = struct.unpack_from('<I', data, len(NpyMagic) + 2)
+		iData = len(NpyMagic) + 6 + headerLength
+	# if ... else
+	header = ast.literal_eval(data[iData - headerLength:iData].decode('latin1'))
+	if header['descr'] != '<i8' or header['fortran_order'] \
+	  or len(header['shape']) != 2 or header['shape'][1] != 2:
+		raise ValueError("NumPy array is not a (N, 2) list of 64-bit ranges")
+	limits = array('q', data[iData:iData + 16 * header['shape'][0]])
+	if sys.byteorder != 'little': limits.byteswap()
+	return RangeList(limits[0::2], limits[1::2])
+# DecodeNpyRanges()
+
+
+def WriteRanges(Ranges, OutputFormat, out):
+	"""Writes the ranges into a binary stream in one of the binary formats."""
+	if OutputFormat == 'npy': out.write(EncodeNpyRanges(Ranges))
+	else: out.write(EncodeVarintRanges(Ranges))
+# WriteRanges()
+
+
+def WriteRangesAtomically(Ranges, OutputFormat, FileName):
+	"""Replaces the file with one with the ranges, so that readers find either
+	the old or the new content in full."""
+	FileName = os.path.abspath(FileName)
+	fd, TempName = tempfile.mkstemp(dir=os.path.dirname(FileName),
+	  prefix='.' + os.path.basename(FileName) + '.')
+	try:
+		with os.fdopen(fd, 'wb') as out:
+			WriteRanges(Ranges, OutputFormat, out)
+			out.flush()
+			os.fsync(out.fileno())
+		# with
+		if os.path.exists(FileName): mode = stat.S_IMODE(os.stat(FileName).st_mode)
+		else: # temporary files are private, new ones follow umask
+			umask = os.umask(0)
+			os.umask(umask)
+			mode = 0o666 & ~umask
+		# if ... else
+		os.chmod(TempName, mode)
+		os.replace(TempName, FileName)
+	except BaseException:
+		os.unlink(TempName)
+		raise
+	# try ... except
+# WriteRangesAtomically()
+
+
+def ReadRanges(InputFile):
+	"""Returns the RangeList stored in a binary file (format is autodetected)."""
+	data = InputFile.read()
+	if data.startswith(NpyMagic): return DecodeNpyRanges(data)
+	return DecodeVarintRanges(data)
+# ReadRanges()
+
+
+def ReadRangeFile(FileName):
+	"""Returns the RangeList stored in the binary file with the given name."""
+	with open(FileName, 'rb') as InputFile: return ReadRanges(InputFile)
+# ReadRangeFile()
+
+
+def ReadValues(Compactor, InputIter, iFirstLine = 0):
+	"""Adds to the compactor all the numbers from the input lines."""
+	for iLine, line in enumerate(InputIter, iFirstLine):
 		line = line.strip()
 		
-		if Debug >= 1: print line
+		if Debug >= 1: print(line)
 		
 		for iToken, token in enumerate(line.split()):
 			if token.startswith('#'): break
 			
 			try: value = int(token)
 			except ValueError:
-				print >>sys.stderr, "Word %d of line %d is not a number (%r)" \
-				  % (iToken+1, iLine+1, token)
-			
-			if Debug >= 1:
-				print "Current range before line %d word %d: %r" \
-				  % (iLine, iToken, ", ".join([ str(SR) for SR in Ranges]))
-			
-			if Debug >= 2: print "[#%d] got %d" % (iToken, value)
-			
-			if len(Ranges) == 0: iRange = 0
-			else: iRange = bisect_left(Ranges, value)
-			
-			if Debug >= 2: print "Next range: #%d" % iRange
-			
-			# lets's see if we can extend the range we found
-			if iRange < len(Ranges) and Ranges[iRange].Extend(value):
-				if Debug >= 2:
-					print "Merging to the range (now %s)" % Ranges[iRange]
-				continue
-			if iRange > 0 and Ranges[iRange-1].Extend(value):
-				if Debug >= 2:
-					print "Merging to the previous range (now %s)" % Ranges[iRange-1]
+				print("Word %d of line %d is not a number (%r)"
+				  % (iToken+1, iLine+1, token), file=sys.stderr)
 				continue
+			# try ... except
+			
+			if Debug >= 2: print("[#%d] got %d" % (iToken, value))
 			
-			if Debug >= 2: print "Inserting a new range"
-			Ranges.insert(iRange, SimpleRange(value))
+			Compactor.add(value)
 			
 		# for token
 		
 	# for line
+	return Compactor
+# ReadValues()
+
+
+CommentPattern = re.compile(br'(?:^|(?<=\s))#[^\n]*', re.M)
+BinaryFormats = { 'int32': 'i', 'int64': 'q', }
+BulkBlockSize = 1 << 24
+
+def ParseTextBlock(block):
+	"""Returns an array with the numbers in the text block.
 	
-	MergedRanges = []
-	LastRange = None
-#	print "Before merging: %s" % (", ".join([ str(SR) for SR in Ranges]), )
-	
-	for SR in Ranges:
-		if Debug >= 2: print "Include %s" % SR
-		if LastRange is None or not LastRange.Merge(SR):
-			MergedRanges.append(SR)
-			if Debug >= 1: 
-				print \
-				  "-> Added: %s" % (", ".join([ str(SR) for SR in MergedRanges]))
-			LastRange = SR
+	Raises ValueError if any word is not a number.
+	"""
+	if b'#' in block: block = CommentPattern.sub(b'', block)
+	if numpy is not None:
+		with warnings.catch_warnings():
+			# numpy complains about unparsed data only with a warning
+			warnings.simplefilter('error')
+			try: return numpy.fromstring(block, dtype=numpy.int64, sep=' ')
+			except (DeprecationWarning, ValueError): pass
+		# with
+	# if numpy
+	return array('q', map(int, block.split()))
+# ParseTextBlock()
+
+
+def InputBlocks(InputFile, InputFormat = 'text', BlockSize = BulkBlockSize):
+	"""Yields the content of a binary-mode input file in large blocks.
+	
+	Text input is cut at the last complete line of each block, and each block
+	is yielded together with the number of lines before it.
+	Binary input is cut at integer boundaries.
+	"""
+	iLine = 0
+	pending = b''
+	if InputFormat != 'text':
+		itemSize = array(BinaryFormats[InputFormat]).itemsize
+		BlockSize -= BlockSize % itemSize
+	# if binary
+	while True:
+		block = InputFile.read(BlockSize)
+		if InputFormat != 'text':
+			if not block:
+				if pending:
+					print("Warning: %d trailing bytes ignored" % len(pending),
+					  file=sys.stderr)
+				# if
+				break
+			# if end of input
+			block = pending + block
+			nComplete = len(block) - len(block) % itemSize
+			block, pending = block[:nComplete], block[nComplete:]
+			if block: yield block, 0
+			continue
+		# if binary
+		
+		if block:
+			iEnd = block.rfind(b'\n') + 1
+			if iEnd == 0: # no complete line yet
+				pending += block
+				continue
+			# if
+			block, pending = pending + block[:iEnd], block[iEnd:]
+		else: block, pending = pending, b''
+		if not block: break
+		
+		yield block, iLine
+		iLine += block.count(b'\n')
+	# while
+# InputBlocks()
+
+
+def CompactBlock(Compactor, block, InputFormat = 'text', iFirstLine = 0):
+	"""Adds to the compactor all the numbers in a block of input.
+	
+	Blocks with invalid words are parsed again line by line, with the usual
+	error messages.
+	"""
+	if InputFormat != 'text':
+		values = array(BinaryFormats[InputFormat], block)
+		if sys.byteorder != 'little': values.byteswap()
+		Compactor.extend(values)
+		return Compactor
+	# if binary
+	
+	if Debug >= 1: print("Parsing %d bytes" % len(block))
+	try: values = ParseTextBlock(block)
+	except ValueError:
+		ReadValues(Compactor,
+		  block.decode(errors='replace').splitlines(), iFirstLine=iFirstLine)
+	else: Compactor.extend(values)
+	return Compactor
+# CompactBlock()
+
+
+def CompactChunk(EngineName, block, InputFormat, iFirstLine):
+	"""Returns the RangeList of a block of input (run in worker processes)."""
+	return CompactBlock(Engines[EngineName](), block, InputFormat, iFirstLine) \
+	  .ranges()
+# CompactChunk()
+
+
+def MergeRangeLists(RangeLists):
+	"""Returns the union of many RangeLists, merged in a single k-way pass."""
+	Merged = RangeList()
+	for lower, upper in heapq.merge(*RangeLists): Merged.append(lower, upper)
+	return Merged
+# MergeRangeLists()
+
+
+def FoldRanges(Base, New):
+	"""Returns the union of two RangeLists, with New expected to be much smaller.
+	
+	The ranges of Base touched by each new range are found by binary search and
+	merged with it; the stretches of Base in between are copied in bulk.
+	"""
+	Result = RangeList()
+	iCopied = 0
+	for lower, upper in New:
+		# touched: from the first range ending at or after lower,
+		# to the last range starting at or before upper
+		iFirst = bisect_left(Base.uppers, lower, iCopied)
+		iEnd = bisect(Base.lowers, upper, iFirst)
+		Result.lowers.extend(Base.lowers[iCopied:iFirst])
+		Result.uppers.extend(Base.uppers[iCopied:iFirst])
+		if iFirst < iEnd:
+			lower = min(lower, Base.lowers[iFirst])
+			upper = max(upper, Base.uppers[iEnd - 1])
+		# if
+		Result.append(lower, upper)
+		iCopied = iEnd
+	# for
+	Result.lowers.extend(Base.lowers[iCopied:])
+	Result.uppers.extend(Base.uppers[iCopied:])
+	return Result
+# FoldRanges()
+
+
+class ParallelCompactor:
+	"""Compacts blocks of input in worker processes.
+	
+	Each block is compacted independently into a RangeList, and all of them are
+	merged at the end. At most two blocks per worker are kept waiting.
+	"""
+	BlockSize = 1 << 22
+	
+	def __init__(self, EngineName, nJobs):
+		self.EngineName = EngineName
+		self.nJobs = nJobs
+		self.executor = ProcessPoolExecutor(nJobs)
+		self.pending = set()
+		self.results = []
+	# __init__()
+	
+	def submit(self, block, InputFormat = 'text', iFirstLine = 0):
+		if len(self.pending) >= 2 * self.nJobs: self._collect(FIRST_COMPLETED)
+		self.pending.add(self.executor.submit
+		  (CompactChunk, self.EngineName, block, InputFormat, iFirstLine))
+	# submit()
+	
+	def ranges(self, *others):
+		"""Returns the merged ranges from all blocks and from the others."""
+		self._collect(ALL_COMPLETED)
+		self.executor.shutdown()
+		return MergeRangeLists(self.results + list(others))
+	# ranges()
+	
+	def _collect(self, return_when):
+		done, self.pending = wait(self.pending, return_when=return_when)
+		self.results.extend(future.result() for future in done)
+	# _collect()
+	
+# class ParallelCompactor
+
+
+class ExternalCompactor:
+	"""Compacts with bounded memory, spilling partial results to disk.
+	
+	Values are collected in chunks which fit the memory limit; each full chunk
+	is sorted and run-length encoded into a temporary file of (lower, upper)
+	64-bit pairs. The files are finally merged in a single streaming k-way
+	pass, reading a limited block of each.
+	"""
+	# approximate memory needed by each value while sorting a chunk
+	ValueCost = 24 if numpy is not None else 48
+	
+	def __init__(self, MemoryLimit):
+		self.MemoryLimit = MemoryLimit
+		self.chunkSize = max(MemoryLimit // self.ValueCost, 1)
+		self.chunk = SortingCompactor()
+		self.spilled = []
+	# __init__()
+	
+	def add(self, value):
+		self.chunk.add(value)
+		if len(self.chunk.values) >= self.chunkSize: self._spill()
+	# add()
+	
+	def extend(self, values):
+		while len(values) > 0:
+			room = self.chunkSize - len(self.chunk.values)
+			self.chunk.extend(values[:room])
+			values = values[room:]
+			if len(self.chunk.values) >= self.chunkSize: self._spill()
+		# while
+	# extend()
+	
+	def ranges(self):
+		Ranges = self.chunk.ranges()
+		self.chunk = SortingCompactor()
+		if not self.spilled: return Ranges
+		# the limit is shared among the read buffers of all the files
+		blockPairs = max(self.MemoryLimit // (32 * len(self.spilled)), 256)
+		Ranges = MergeRangeLists([ Ranges ]
+		  + [ self._stream(SpillFile, blockPairs) for SpillFile in self.spilled ])
+		for SpillFile in self.spilled: SpillFile.close()
+		self.spilled = []
+		return Ranges
+	# ranges()
+	
+	def _spill(self):
+		SpillFile = tempfile.TemporaryFile(prefix='CompactIntegers')
+		limits = self.chunk.ranges().boundaries()
+		self.chunk = SortingCompactor()
+		if Debug >= 1:
+			print("Spilling %d ranges into temporary file #%d"
+			  % (len(limits) // 2, len(self.spilled) + 1))
+		# if
+		limits.tofile(SpillFile)
+		self.spilled.append(SpillFile)
+	# _spill()
+	
+	@staticmethod
+	def _stream(SpillFile, blockPairs):
+		SpillFile.seek(0)
+		while True:
+			limits = array('q', SpillFile.read(16 * blockPairs))
+			if not limits: break
+			yield from zip(limits[0::2], limits[1::2])
+		# while
+	# _stream()
+	
+# class ExternalCompactor
+
+
+def ParseMemorySize(spec):
+	"""Converts a size like "512M" or "4G" into bytes."""
+	match = re.match(r'^\s*(\d+(?:\.\d*)?)\s*([kKMGT]?)i?B?\s*$', spec)
+	if not match: raise ValueError("invalid memory size: %r" % spec)
+	factor = 1024 ** ' KMGT'.index(match.group(2).upper() or ' ')
+	return int(float(match.group(1)) * factor)
+# ParseMemorySize()
+
+
+def CompactInputs(EngineName, InputFiles, InputFormat = 'text', Specs = None,
+  FallbackFile = None, nJobs = 1, MemoryLimit = None):
+	"""Returns the RangeList of all the numbers from the command line (Specs)
+	and from the input files.
+	
+	If there is no other input, FallbackFile is read instead.
+	With more than one job, input blocks are compacted in parallel.
+	With a memory limit (in bytes), an ExternalCompactor is used instead of
+	the engine.
+	"""
+	Compactor = ExternalCompactor(MemoryLimit) if MemoryLimit \
+	  else Engines[EngineName]()
+	nRead = 0
+	if Specs:
+		ReadValues(Compactor, ListsThenInput(Specs))
+		nRead += len(Specs)
+	# if
+	Workers = ParallelCompactor(EngineName, nJobs) if nJobs > 1 else None
+	BlockSize = ParallelCompactor.BlockSize if Workers else BulkBlockSize
+	if MemoryLimit: BlockSize = max(min(BlockSize, MemoryLimit // 8), 4096)
+	
+	for InputFile in InputFiles + [ FallbackFile ]:
+		if InputFile is None or (InputFile is FallbackFile and nRead > 0): continue
+		for block, iFirstLine in InputBlocks(InputFile, InputFormat, BlockSize):
+			nRead += len(block)
+			if Workers: Workers.submit(block, InputFormat, iFirstLine)
+			else: CompactBlock(Compactor, block, InputFormat, iFirstLine)
+		# for blocks
+	# for input files
+	
+	return Workers.ranges(Compactor.ranges()) if Workers else Compactor.ranges()
+# CompactInputs()
+
+
+if __name__ == "__main__":
+	
+	Parser = argparse.ArgumentParser(description=__doc__)
+	
+	Parser.add_argument("Specs", nargs="*", metavar="number",
+	  help="numbers to be compacted")
+	Parser.add_argument("-O", "--format", dest="PrintFormat", default=None,
+	  help="linear, sums, columnsums or columns; or binary: "
+	  + " or ".join(BinaryOutputFormats) + " [linear, or none with --state]")
+	Parser.add_argument("-i", "--input", "--inputfile", dest="InputFileNames",
+	  default=[], action="append", help="read input also from this file")
+	Parser.add_argument("--input-format", dest="InputFormat", default="text",
+	  choices=[ 'text', ] + list(BinaryFormats),
+	  help="format of input files and standard input: text or binary"
+	  " (little endian) integers [%(default)s]")
+	Parser.add_argument("-R", "--ranges", dest="RangeFileNames", default=[],
+	  action="append",
+	  help="merge also the ranges from this file, written in a binary format")
+	Parser.add_argument("--state", dest="StateFile", default=None,
+	  help="fold the new values into the ranges stored in this file, and"
+	  " update it (a new file is written in npy format)")
+	Parser.add_argument("-S", "--nostdin", dest="NoStdIn", action="store_true",
+	  help="don't read from stdin if there is no other input")
+	Parser.add_argument("-E", "--engine", dest="Engine", default=DefaultEngine,
+	  choices=list(Engines),
+	  help="compaction algorithm: 'sort' (collect and sort all values),"
+	  " 'blocked' (blocked sorted ranges, for large unsorted inputs with many"
+	  " repetitions), 'roaring' (compressed bitmap containers, for inputs dense"
+	  " in some regions and sparse in others) or 'insert' (the original one)"
+	  " [%(default)s]")
+	Parser.add_argument("--setop", dest="SetOperation", default=None,
+	  choices=list(SetOperations),
+	  help="treat the numbers on the command line and each input file as"
+	  " separate sets, and combine them left to right with this operation")
+	Parser.add_argument("-j", "--jobs", dest="Jobs", type=int, default=1,
+	  help="number of processes compacting input blocks in parallel"
+	  " [%(default)s]")
+	Parser.add_argument("--memory", dest="MemoryLimit", default=None,
+	  help="compact with about this much memory (e.g. 512M, 4G), using"
+	  " temporary files sorted in chunks (in $TMPDIR)")
+	Parser.add_argument("-d", "--debug", dest="Debug", type=int, default=0,
+	  help="verbosity level [%(default)s]")
+	Parser.add_argument("--version", "-V", action="version",
+	  version="%(prog)s " + __version__)
+	
+	options = Parser.parse_args()
+	Specs = options.Specs
+	if options.Jobs < 1: Parser.error("--jobs must be a positive number")
+	if options.MemoryLimit:
+		try: options.MemoryLimit = ParseMemorySize(options.MemoryLimit)
+		except ValueError as e: Parser.error(str(e))
+		if options.Jobs > 1: Parser.error("--memory can't be used with --jobs")
+	# if memory
+	if options.StateFile and options.SetOperation:
+		Parser.error("--state can't be used with --setop")
+	if options.PrintFormat is None and not options.StateFile:
+		options.PrintFormat = "linear"
+	
+	Debug = options.Debug
+	
+	InputFiles = []
+	
+	for InputFileName in options.InputFileNames:
+		if len(InputFileName) == 0 or InputFileName == '-':
+			InputFile = sys.stdin.buffer
 		else:
-			if Debug >= 1:
-				print \
-				  "-> Merged: %s" % (", ".join([ str(SR) for SR in MergedRanges]))
+			InputFile = open(InputFileName, 'rb')
+		InputFiles.append(InputFile)
 	# for
 	
-	if options.PrintFormat == "sums":
-		print "%d merged values: %s" % (sum([ len(SR) for SR in MergedRanges ]),
-		  ", ".join([ "%s (%d)" % (SR, len(SR)) for SR in MergedRanges]))
-	elif options.PrintFormat == "linear":
-		print "Merged values: %s" \
-		  % (", ".join([ str(SR) for SR in MergedRanges ]))
-	elif options.PrintFormat == "columnsums":
-		for SR in MergedRanges:
-			if SR.upper is None: print 1, SR.lower
-			else: print len(SR), SR.lower, SR.last()
+	try:
+		StoredRanges = [ ReadRangeFile(RangeFileName)
+		  for RangeFileName in options.RangeFileNames ]
+	
+		if options.StateFile and os.path.exists(options.StateFile):
+			with open(options.StateFile, 'rb') as StateFile:
+				StateFormat = 'npy' if StateFile.read(len(NpyMagic)) == NpyMagic \
+				  else 'varint'
+				StateFile.seek(0)
+				State = ReadRanges(StateFile)
+			# with
+		else: StateFormat, State = 'npy', RangeList()
+	except ValueError as e: Parser.error(str(e))
+	
+	if options.SetOperation:
+		Operands = ([ Specs ] if Specs else []) + InputFiles + StoredRanges
+		if not Operands:
+			if options.NoStdIn: Parser.error("no input sets")
+			Operands = [ sys.stdin.buffer ]
+		# if
+		keep = SetOperations[options.SetOperation]
+		Result = None
+		for Operand in Operands:
+			if isinstance(Operand, RangeList): Ranges = Operand
+			elif Operand is Specs:
+				Ranges = CompactInputs(options.Engine, [], Specs=Specs)
+			else:
+				Ranges = CompactInputs(options.Engine, [ Operand ],
+				  options.InputFormat, nJobs=options.Jobs,
+				  MemoryLimit=options.MemoryLimit)
+			# if ... else
+			Result = Ranges if Result is None \
+			  else CombineRanges(Result, Ranges, keep)
 		# for
 	else:
-		for SR in MergedRanges:
-			if SR.upper is None: print SR.lower
-			else: print SR.lower, SR.last()
-		
+		ReadStdIn = not options.NoStdIn and not StoredRanges
+		Result = CompactInputs(options.Engine, InputFiles, options.InputFormat,
+		  Specs=Specs, FallbackFile=sys.stdin.buffer if ReadStdIn else None,
+		  nJobs=options.Jobs, MemoryLimit=options.MemoryLimit)
+		if StoredRanges: Result = MergeRangeLists([ Result ] + StoredRanges)
+	# if ... else
+	for InputFile in InputFiles:
+		if InputFile is not sys.stdin.buffer: InputFile.close()
+	# for
+	
+	if options.StateFile:
+		Result = FoldRanges(State, Result) if len(Result) <= len(State) \
+		  else FoldRanges(Result, State)
+		WriteRangesAtomically(Result, StateFormat, options.StateFile)
+		if options.PrintFormat is None: sys.exit(0)
+	# if state
+	
+	if options.PrintFormat in BinaryOutputFormats:
+		WriteRanges(Result, options.PrintFormat, sys.stdout.buffer)
+	else: PrintRanges(Result, options.PrintFormat)
+	
 	sys.exit(0)
-# main()
\ No newline at end of file
+# main()
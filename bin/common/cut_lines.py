@@ -7,8 +7,14 @@ If a file is compressed by gzip or bzip2, it is uncompressed.
 """
 
 import sys
+import os
+import re
+import math
+import time
+import itertools
+import hashlib
 
-try: import gz
+try: import gzip
 except ImportError: pass
 try: import bz2
 except ImportError: pass
@@ -21,12 +27,16 @@ def OPEN(filename, mode = 'r'):
   if filename.endswith('.gz'):
     OpenProc = gzip.open
   elif filename.endswith('.bz2'):
-    OpenProc = bz2.BZ2File.__call__
+    OpenProc = bz2.open
   else:
     OpenProc = open
+  # compressed files are opened in binary mode unless told otherwise
+  if OpenProc is not open and 'b' not in mode and 't' not in mode: mode += 't'
   f = OpenProc(filename, mode)
   # GzipFile from Python 2.4 has no name attribute (it has "filename" though)
-  if not hasattr(f, 'name'): f.name = filename
+  if not hasattr(f, 'name'):
+    try: f.name = filename
+    except AttributeError: pass # e.g. text wrappers of bzip2 files
   return f
 # OPEN()
 
@@ -54,14 +64,116 @@ def CutFileLines(
   
   dataiter = iter(data)
   
-  for i in range(skipLines): next(dataiter)
+  # skip lines without looking at them (fast)
+  collections.deque(itertools.islice(dataiter, skipLines), maxlen=0)
   
   if n is None: return list(dataiter)
-  else: return list(next(dataiter) for i in range(n))
+  else: return list(itertools.islice(dataiter, n))
   
 # CutFileLines()
 
 
+# ------------------------------------------------------------------------------
+LineCountCacheDir = os.path.join(
+  os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'),
+  'cut_lines',
+  )
+# counting files smaller than this is cheap enough not to be worth a cache entry
+# (compressed files are uncompressed to count: their threshold is lower)
+LineCountCacheMinSize = 32 << 20
+LineCountCacheMinCompressedSize = 2 << 20
+LineCountCacheMaxEntries = 256 # least recently used entries are removed beyond
+
+def trimLineCountCache(
+ maxEntries: "number of entries to keep" = None,
+ ) -> "number of removed entries":
+  """Removes the least recently used entries beyond `maxEntries` from the cache."""
+  if maxEntries is None: maxEntries = LineCountCacheMaxEntries
+  try:
+    entries = [ entry for entry in os.scandir(LineCountCacheDir) if entry.is_file() ]
+  except OSError: return 0
+  if len(entries) <= maxEntries: return 0
+  entries.sort(key=lambda entry: entry.stat().st_mtime_ns)
+  nRemoved = 0
+  for entry in entries[:len(entries) - maxEntries]:
+    try: os.remove(entry.path)
+    except OSError: continue
+    nRemoved += 1
+  # for
+  return nRemoved
+# trimLineCountCache()
+
+def countFileLines(
+ file_: "binary file to count the lines of (from the current position)",
+ blockSize: "size of the blocks to read at once" = 1 << 20,
+ ) -> "the number of lines (an unterminated last line is counted too)":
+  """Counts the lines by reading large blocks and counting new lines in them."""
+  buffer = bytearray(blockSize)
+  n = 0
+  lastByte = b'\n'[0]
+  while True:
+    nRead = file_.readinto(buffer)
+    if not nRead: break
+    n += buffer.count(b'\n', 0, nRead)
+    lastByte = buffer[nRead - 1]
+  # while
+  if lastByte != b'\n'[0]: n += 1
+  return n
+# countFileLines()
+
+
+def countLines(
+ FileName: "path of the file to count the lines of",
+ uncompress: "whether to count the lines of the uncompressed content" = True,
+ useCache: "whether to use (and update) the line count cache" = True,
+ cachedOnly: "if the count is not in the cache, just return None" = False,
+ ) -> "the number of lines in the file":
+  """Counts the lines in a file, remembering the result for the next time.
+  
+  The cache is keyed by the real path of the file and invalidated when its size
+  or its modification time change. Only the counts of large files are stored,
+  and only the most recently used `LineCountCacheMaxEntries` are kept.
+  """
+  stat = os.stat(FileName)
+  realPath = os.path.realpath(FileName)
+  FileKey = "%d %d %d" % (stat.st_size, stat.st_mtime_ns, bool(uncompress))
+  CacheFile = os.path.join(LineCountCacheDir,
+    hashlib.sha1(os.fsencode(realPath)).hexdigest())
+  
+  if useCache:
+    try:
+      with open(CacheFile, 'r') as cache:
+        key, count, cachedPath = cache.read().rsplit(maxsplit=2)
+      if key == FileKey and cachedPath == realPath:
+        try: os.utime(CacheFile) # mark as recently used
+        except OSError: pass
+        return int(count)
+      # if
+    except (OSError, ValueError): pass # no (valid) cache entry
+  # if use cache
+  if cachedOnly: return None
+  
+  with (OPEN if uncompress else open)(FileName, mode='rb') as File:
+    n = countFileLines(File)
+  
+  compressed = uncompress and FileName.endswith(( '.gz', '.bz2' ))
+  if stat.st_size < (LineCountCacheMinCompressedSize if compressed
+   else LineCountCacheMinSize):
+    useCache = False # cheap to count again
+  if useCache:
+    try:
+      os.makedirs(LineCountCacheDir, exist_ok=True)
+      TempFile = "%s.%d.tmp" % (CacheFile, os.getpid())
+      with open(TempFile, 'w') as cache:
+        print(FileKey, n, realPath, file=cache)
+      os.replace(TempFile, CacheFile)
+      trimLineCountCache()
+    except OSError: pass # caching is only an optimization
+  # if use cache
+  return n
+# countLines()
+
+
 # ------------------------------------------------------------------------------
 def cutLines(
  file_: "text file to read lines from",
@@ -69,6 +181,7 @@ def cutLines(
  lines: "number of lines to cut (negative goes backward from start, None: all)"
    = None,
  stopline: "line to stop at, included (negative starts from the end)" = None,
+ nLines: "total number of lines in `file_`, if known" = None,
  ) -> "a buffer with the selected lines, not stripped":
   assert lines is None or stopline is None
   assert startline != 0 and stopline != 0
@@ -120,17 +233,614 @@ def cutLines(
   
   # go for it!
   if startline < 0: # start keeping lines
-    n, tail = FileTail(file_, n=-startline)
+    if nLines is None:
+      n, tail = FileTail(file_, n=-startline)
+    else: # we know where the tail starts: skip to it
+      n = nLines
+      tail = CutFileLines(file_, skipLines=max(n + startline, 0), n=lines)
+    # if ... else
     if lines is not None: tail = tail[:lines]
     if stopline is not None: tail = tail[:stopline + 1 - (n + startline)]
     return tail
   else: # start skipping lines
+    if nLines is not None and stopline is not None and stopline < 0:
+      # we know where the selection ends: stop there
+      assert lines is None
+      lines = max(nLines - (startline - 1) + stopline, 0)
+      stopline = None
+    # if
     return CutFileLines(file_, skipLines=(startline - 1), n=lines)[:stopline]
   # if
   
 # cutLines()
 
 
+# ------------------------------------------------------------------------------
+def parseLineRanges(
+ spec: "comma-separated list of `START[-[STOP]][/STEP]` specifications",
+ ) -> "a list of (start, stop, step) tuples (stop is None if open-ended)":
+  """Parses a multi-range specification.
+  
+  Each range is `START[-[STOP]][/STEP]`: line numbers are 1-based and included,
+  and negative numbers count from the end (the last line is -1).
+  A single `START` selects just that line, `START-` goes to the end of the file.
+  `STEP` keeps only every STEP-th line of the range, starting with START.
+  Examples: `10-20,1000-1010,-50-`, `1-/100`, `-5--2`.
+  """
+  ranges = []
+  for rangeSpec in spec.split(','):
+    rangeSpec = rangeSpec.strip()
+    if not rangeSpec: continue
+    match = LineRangePattern.match(rangeSpec)
+    if match is None:
+      raise ValueError(f"Invalid line range specification: '{rangeSpec}'")
+    start = int(match.group('start'))
+    if match.group('dash') is None: stop = start
+    elif match.group('stop') is None: stop = None
+    else: stop = int(match.group('stop'))
+    step = int(match.group('step') or 1)
+    if start == 0 or stop == 0:
+      raise ValueError(f"0 is not a valid line number (range: '{rangeSpec}')")
+    if step < 1:
+      raise ValueError(f"Invalid step {step} in range '{rangeSpec}'")
+    ranges.append(( start, stop, step ))
+  # for
+  return ranges
+# parseLineRanges()
+
+LineRangePattern = re.compile(
+  r'^(?P<start>[+-]?\d+)(?P<dash>-(?P<stop>[+-]?\d+)?)?(?:/(?P<step>\d+))?$'
+  )
+
+
+def resolveLineRange(
+ start: "first line of the range (negative counts from the end)",
+ stop: "last line of the range (negative counts from the end, None: all)",
+ step: "keep one line every `step`",
+ nLines: "total number of lines (None if not known yet)" = None,
+ ) -> "absolute (first, last, step) (last may be infinite), None if not known or empty":
+  """Resolves a range into absolute line numbers.
+  
+  If `nLines` is not known, the ranges starting from the end are not resolved
+  (`None` is returned) and the ones stopping at a line from the end are assumed
+  not to stop at all: this is correct for all the lines which are known to be
+  farther than that from the end of the data.
+  """
+  if start < 0:
+    if nLines is None: return None
+    start += nLines + 1
+  if stop is None: stop = math.inf
+  elif stop < 0: stop = math.inf if nLines is None else (stop + nLines + 1)
+  if start < 1: start += -((start - 1) // step) * step # first line in stride
+  return ( start, stop, step ) if start <= stop else None
+# resolveLineRange()
+
+
+class LineRangePlan:
+  """Selection of lines from a merged set of ranges.
+  
+  Line numbers must be queried in increasing order.
+  """
+  def __init__(self,
+   ranges: "list of (start, stop, step) ranges",
+   nLines: "total number of lines (None if not known)" = None,
+   ):
+    intervals = []
+    self.strided = []
+    for range_ in ranges:
+      resolved = resolveLineRange(*range_, nLines=nLines)
+      if resolved is None: continue
+      if resolved[2] == 1: intervals.append(resolved[:2])
+      else:                self.strided.append(resolved)
+    # for
+    
+    # contiguous ranges are merged into a sorted list of disjoint intervals
+    self.intervals = []
+    for first, last in sorted(intervals):
+      if self.intervals and first <= self.intervals[-1][1] + 1:
+        self.intervals[-1][1] = max(self.intervals[-1][1], last)
+      else: self.intervals.append([ first, last ])
+    # for
+    self.iInterval = 0
+  # __init__()
+  
+  def nextRun(self, line: "line number") -> "(first, last) run, None if none":
+    """Returns the first block of consecutive selected lines not before `line`.
+    
+    A run from a contiguous range is returned whole (`last` may be infinite),
+    lines from strided ranges one at a time.
+    """
+    intervals = self.intervals
+    while self.iInterval < len(intervals) and intervals[self.iInterval][1] < line:
+      self.iInterval += 1
+    if self.iInterval < len(intervals):
+      first, last = intervals[self.iInterval]
+      run = ( max(first, line), last )
+    else: run = None
+    for first, last, step in self.strided:
+      if line > first: first += -((first - line) // step) * step # ceiling
+      if first > last: continue
+      if run is None or first < run[0]: run = ( first, first )
+    # for
+    return run
+  # nextRun()
+
+# class LineRangePlan
+
+
+def selectedRuns(
+ lines: "list of lines",
+ firstLine: "line number of the first line in the list",
+ plan: "the `LineRangePlan` to select with",
+ ) -> "iterator over the lines of the list selected by the plan":
+  endLine = firstLine + len(lines)
+  line = firstLine
+  while line < endLine:
+    run = plan.nextRun(line)
+    if run is None or run[0] >= endLine: break
+    first, last = run[0], min(run[1], endLine - 1)
+    yield from lines[first - firstLine:last + 1 - firstLine]
+    line = last + 1
+  # while
+# selectedRuns()
+
+
+def cutLineRanges(
+ file_: "text file to read lines from",
+ ranges: "list of (start, stop, step) ranges (see `parseLineRanges()`)",
+ nLines: "total number of lines, if known" = None,
+ ) -> "iterator over the lines selected by any of the ranges, not stripped":
+  """Selects lines from many ranges in a single pass, in the original order.
+  
+  Lines selected by more than one range are returned only once.
+  The lines between the selected ones are skipped without looking at them.
+  Only if the number of lines is not known and some range is relative to the
+  end of the data, the last lines are held in a buffer until the end of the
+  data is reached.
+  """
+  if nLines is None:
+    tailLength = max((
+      -limit for range_ in ranges for limit in range_[:2]
+      if limit is not None and limit < 0
+      ), default=0)
+  else: tailLength = 0
+  
+  plan = LineRangePlan(ranges, nLines)
+  lines = iter(file_)
+  
+  if not tailLength: # the plan is final: jump from run to run
+    iLine = 0 # lines read so far
+    while True:
+      run = plan.nextRun(iLine + 1)
+      if run is None: break
+      first, last = run
+      skip = first - iLine - 1
+      if skip: next(itertools.islice(lines, skip, skip), None)
+      line = next(lines, None)
+      if line is None: break # end of data
+      yield line
+      if last == math.inf:
+        yield from lines
+        break
+      # if
+      yield from itertools.islice(lines, last - first)
+      iLine = last
+    # while
+    return
+  # if
+  
+  # lines closer than `tailLength` to the end may be selected or not depending
+  # on the ranges relative to the end: decisions are delayed by that many
+  # lines, reading blocks of lines at a time
+  BlockLength = 1 << 16
+  buffered = []
+  firstBuffered = 1 # line number of `buffered[0]`
+  while True:
+    block = list(itertools.islice(lines, BlockLength))
+    if not block: break
+    buffered.extend(block)
+    nDecided = len(buffered) - tailLength
+    if nDecided <= 0: continue
+    yield from selectedRuns(buffered[:nDecided], firstBuffered, plan)
+    del buffered[:nDecided]
+    firstBuffered += nDecided
+  # while
+  
+  # now we know how many lines there are: complete the selection
+  if buffered:
+    yield from selectedRuns(buffered, firstBuffered,
+      LineRangePlan(ranges, firstBuffered + len(buffered) - 1))
+  # if
+
+# cutLineRanges()
+
+
+# ------------------------------------------------------------------------------
+def cutPatternRange(
+ file_: "binary file to read lines from",
+ fromPattern: "compiled bytes regex matching the first line (None: first line)"
+   = None,
+ toPattern: "compiled bytes regex matching the last line (None: to the end)"
+   = None,
+ anchors: "if a dictionary, the number of the matched lines is stored there"
+   = None,
+ blockSize: "size of the blocks to read at once" = 1 << 20,
+ ) -> "an iterator of blocks of bytes with all the selected lines":
+  """Selects from the first line matching `fromPattern` to the next one matching
+  `toPattern` (both included).
+  
+  The stop pattern is looked for starting from the line after the one matching
+  `fromPattern` (or from the first line, if there is no `fromPattern`).
+  The data is scanned in large blocks of complete lines, which are searched
+  directly without being split into lines: patterns are expected to match
+  within a single line (compile them with `re.MULTILINE` to use `^` and `$`).
+  The numbers of the matched lines are stored into `anchors` under the keys
+  `'from'` and `'to'`.
+  """
+  if anchors is None: anchors = {}
+  started = fromPattern is None
+  iLine = 0 # number of lines before the current block
+  carry = b'' # incomplete line from the previous block
+  while True:
+    chunk = file_.read(blockSize)
+    if chunk:
+      data = carry + chunk
+      iEnd = data.rfind(b'\n') + 1
+      if iEnd == 0: # not even a complete line yet
+        carry = data
+        continue
+      # if
+      block, carry = data[:iEnd], data[iEnd:]
+    elif carry: block, carry = carry, b'' # the last line, unterminated
+    else: break
+    
+    # the final new line is left out of the search, or patterns like `^$`
+    # would match right after it, that is in the next block
+    searchTo = len(block) - 1 if block.endswith(b'\n') else len(block)
+    start = 0 # start of the selection in the block
+    searchFrom = 0 # where to look for the stop pattern from
+    if not started:
+      match = fromPattern.search(block, 0, searchTo)
+      if match is None:
+        iLine += block.count(b'\n')
+        continue
+      # if
+      start = block.rfind(b'\n', 0, match.start()) + 1
+      iLine += block.count(b'\n', 0, start)
+      anchors['from'] = iLine + 1
+      searchFrom = block.find(b'\n', start) + 1 or len(block)
+      started = True
+    # if not started
+    
+    if toPattern is not None:
+      match = toPattern.search(block, searchFrom, searchTo)
+      if match is not None:
+        stop = block.find(b'\n', match.start()) + 1 or len(block)
+        anchors['to'] = iLine + block.count(b'\n', start, match.start()) + 1
+        yield block[start:stop]
+        return
+      # if
+    # if
+    
+    yield block[start:] if start else block
+    iLine += block.count(b'\n', start)
+  # while
+# cutPatternRange()
+
+
+# ------------------------------------------------------------------------------
+def openInputFile(
+ FileName: "path of the file to open (None: standard input)",
+ options: "parsed command line options",
+ binary: "whether to open the file in binary mode" = False,
+ ) -> "the opened file":
+  if FileName is None: return sys.stdin.buffer if binary else sys.stdin
+  try:
+    return (open if options.DontUncompress else OPEN) \
+      (FileName, mode=('rb' if binary else 'r'))
+  except IOError:
+    print("Can't open source file '%s'." % FileName, file=sys.stderr)
+    raise
+# openInputFile()
+
+
+def neededLineCount(
+ FileName: "path of the file to read lines from (None: standard input)",
+ options: "parsed command line options",
+ ranges: "list of ranges from `parseLineRanges()` (None: use `options`)"
+   = None,
+ ) -> "the number of lines of the file if useful and cheap, None otherwise":
+  """Returns the number of lines in the file, if it helps the selection.
+  
+  Knowing the number of lines in advance lets the selection relative to the end
+  of the file skip lines quickly and stop early. The count of compressed files
+  is used only if already cached.
+  """
+  if FileName is None: return None
+  if ranges is not None: limits = [ l for r in ranges for l in r[:2] ]
+  else:                  limits = [ options.startline, options.stopline ]
+  if not any(l is not None and l < 0 for l in limits): return None
+  
+  compressed = not options.DontUncompress \
+    and FileName.endswith(( '.gz', '.bz2' ))
+  try:
+    return countLines(FileName, uncompress=not options.DontUncompress,
+      useCache=not options.nocache, cachedOnly=compressed)
+  except OSError: return None # the caller will complain about the file
+# neededLineCount()
+
+
+def selectLines(
+ file_: "text file to read lines from",
+ options: "parsed command line options",
+ ranges: "list of ranges from `parseLineRanges()` (None: use `options`)"
+   = None,
+ nLines: "total number of lines in the file, if known" = None,
+ ) -> "an iterable with the selected lines, not stripped":
+  if ranges is not None: return cutLineRanges(file_, ranges, nLines=nLines)
+  return cutLines(file_,
+    startline=options.startline, lines=options.lines, stopline=options.stopline,
+    nLines=nLines,
+    )
+# selectLines()
+
+
+def cutFile(
+ FileName: "path of the file to read lines from",
+ options: "parsed command line options",
+ ranges: "list of ranges from `parseLineRanges()` (None: use `options`)"
+   = None,
+ ) -> "a list with the selected lines, not stripped":
+  """Returns the lines selected from a file (suitable for worker processes)."""
+  nLines = neededLineCount(FileName, options, ranges)
+  with openInputFile(FileName, options) as File:
+    return list(selectLines(File, options, ranges, nLines=nLines))
+# cutFile()
+
+
+def cutFilesInParallel(
+ FileNames: "list of paths of the files to read lines from",
+ options: "parsed command line options",
+ ranges: "list of ranges from `parseLineRanges()` (None: use `options`)",
+ nJobs: "number of worker processes",
+ ) -> "an iterator of (file name, selected lines), in the order of the files":
+  """Selects lines from the files in a pool of processes.
+  
+  Results are returned in the same order as the input files.
+  No more than `2 * nJobs` files are being processed or waiting to be returned
+  at any time, so memory usage stays bounded even for very long file lists.
+  """
+  import concurrent.futures
+  
+  maxPending = 2 * nJobs
+  pending = collections.deque()
+  with concurrent.futures.ProcessPoolExecutor(max_workers=nJobs) as pool:
+    for FileName in FileNames:
+      if len(pending) >= maxPending:
+        PendingName, result = pending.popleft()
+        yield PendingName, result.result()
+      # if
+      pending.append(
+        ( FileName, pool.submit(cutFile, FileName, options, ranges), )
+        )
+    # for
+    while pending:
+      PendingName, result = pending.popleft()
+      yield PendingName, result.result()
+    # while
+  # with
+# cutFilesInParallel()
+
+
+def printSelection(
+ FileName: "path of the file the lines come from (None: standard input)",
+ lines: "the lines to be printed (not stripped)",
+ verbose: "whether to print a header line before the lines" = False,
+ out: "output stream (binary if the lines are bytes)" = None,
+ ):
+  if out is None: out = sys.stdout
+  if verbose:
+    out.flush()
+    print(80*"-", file=sys.stderr)
+    print(
+      "Standard input:" if FileName is None else ("File: '%s'" % FileName),
+      file=sys.stderr, flush=True
+      )
+  # if verbose
+  
+  # note that lines have not been stripped!
+  out.writelines(lines)
+# printSelection()
+
+
+# ------------------------------------------------------------------------------
+class InotifyWatcher:
+  """Minimal interface to Linux inotify (via `ctypes`), to wait for changes.
+  
+  The events are not decoded: the watcher just reports that something happened
+  to one of the watched files.
+  """
+  IN_MODIFY      = 0x00000002
+  IN_ATTRIB      = 0x00000004
+  IN_DELETE_SELF = 0x00000400
+  IN_MOVE_SELF   = 0x00000800
+  IN_NONBLOCK    = 0o0004000
+  IN_CLOEXEC     = 0o2000000
+  
+  WatchMask = IN_MODIFY | IN_ATTRIB | IN_DELETE_SELF | IN_MOVE_SELF
+  
+  def __init__(self):
+    import ctypes, ctypes.util
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    try:
+      self._addWatch = libc.inotify_add_watch
+      self._rmWatch = libc.inotify_rm_watch
+    except AttributeError: # not Linux
+      raise OSError("inotify is not supported on this platform")
+    self._addWatch.argtypes = [ ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32 ]
+    self._rmWatch.argtypes = [ ctypes.c_int, ctypes.c_int ]
+    self.fd = libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+    if self.fd < 0:
+      errno = ctypes.get_errno()
+      raise OSError(errno, os.strerror(errno))
+    self._getErrno = ctypes.get_errno
+  # __init__()
+  
+  def watch(self, path: "path of the file to watch") -> "watch descriptor":
+    wd = self._addWatch(self.fd, os.fsencode(path), self.WatchMask)
+    if wd < 0:
+      errno = self._getErrno()
+      raise OSError(errno, os.strerror(errno), path)
+    return wd
+  # watch()
+  
+  def unwatch(self, wd: "watch descriptor"):
+    self._rmWatch(self.fd, wd) # failure means the file is already gone
+  
+  def wait(self, timeout: "maximum waiting time [s]") -> "whether events arrived":
+    import select
+    ready, _, _ = select.select([ self.fd ], [], [], timeout)
+    if not ready: return False
+    try:
+      while os.read(self.fd, 65536): pass # drain all pending events
+    except BlockingIOError: pass
+    return True
+  # wait()
+  
+  def close(self): os.close(self.fd)
+  
+# class InotifyWatcher
+
+
+class FollowedFile:
+  """A file being followed: reads appended data, complete lines only.
+  
+  Truncation and rotation (the path pointing to a different inode) are
+  detected; a truncated file is read again from its new start, a rotated one
+  is read to its end (including an unterminated last line) and then replaced
+  by the new file, read from its start.
+  """
+  BlockSize = 1 << 20
+  
+  def __init__(self,
+   path: "path of the file",
+   file_: "the open file (binary, positioned where reading should resume)",
+   ):
+    self.path = path
+    self.file = file_
+    self.pending = b'' # incomplete last line
+    self.wd = None
+    stat = os.fstat(file_.fileno())
+    self.fileID = ( stat.st_dev, stat.st_ino )
+  # __init__()
+  
+  def read(self) -> "the new complete lines, as a single bytes block":
+    chunks = [ self.pending ]
+    while True:
+      chunk = self.file.read(self.BlockSize)
+      if not chunk: break
+      chunks.append(chunk)
+    # while
+    data = b''.join(chunks)
+    iEnd = data.rfind(b'\n') + 1
+    self.pending = data[iEnd:]
+    return data[:iEnd]
+  # read()
+  
+  def checkReplaced(self) -> "None if unchanged, else the rest of the old file":
+    try: stat = os.stat(self.path)
+    except FileNotFoundError: return None # rotated, and not replaced yet
+    if ( stat.st_dev, stat.st_ino ) != self.fileID:
+      # finish the old file first: lines written since the last read,
+      # and the last line even if not terminated
+      data = self.read() + self.pending
+      if self.pending: data += b'\n'
+      self.pending = b''
+      self.file.close()
+      self.file = open(self.path, 'rb')
+      stat = os.fstat(self.file.fileno())
+      self.fileID = ( stat.st_dev, stat.st_ino )
+      return data
+    # if rotated
+    if stat.st_size < self.file.tell():
+      self.file.seek(0)
+      self.pending = b''
+      return b''
+    # if truncated
+    return None
+  # checkReplaced()
+  
+  def close(self): self.file.close()
+  
+# class FollowedFile
+
+
+def followFiles(
+ FileNames: "list of paths of the files to follow",
+ options: "parsed command line options",
+ ranges: "list of ranges from `parseLineRanges()` (None: use `options`)"
+   = None,
+ ):
+  """Prints the selected lines of each file, then the lines appended to them.
+  
+  Files are waited for with inotify if available, by polling otherwise.
+  All the new lines found at each check are written at once.
+  Never returns (it is interrupted by the user).
+  """
+  out = sys.stdout.buffer
+  
+  Followed = []
+  for FileName in FileNames:
+    try:
+      File = open(FileName, 'rb')
+    except IOError:
+      print("Can't open source file '%s'." % FileName, file=sys.stderr)
+      raise
+    printSelection(FileName, selectLines(File, options, ranges),
+      verbose=options.verbose, out=out)
+    while File.read(FollowedFile.BlockSize): pass # skip the unselected rest
+    Followed.append(FollowedFile(FileName, File))
+  # for
+  out.flush()
+  
+  try: watcher = InotifyWatcher()
+  except OSError: watcher = None # fall back to polling
+  
+  def updateWatch(followed):
+    if watcher is None: return
+    if followed.wd is not None: watcher.unwatch(followed.wd)
+    followed.wd = watcher.watch(followed.path)
+  # updateWatch()
+  
+  for followed in Followed: updateWatch(followed)
+  
+  LastPrinted = Followed[-1] if Followed else None
+  try:
+    while True:
+      if watcher is None: time.sleep(options.sleep_interval)
+      else:               watcher.wait(options.sleep_interval)
+      for followed in Followed:
+        data = followed.read()
+        oldData = followed.checkReplaced()
+        if oldData is not None:
+          updateWatch(followed)
+          data += oldData + followed.read()
+        # if
+        if not data: continue
+        if options.verbose and followed is not LastPrinted:
+          printSelection(followed.path, [], verbose=True, out=out)
+        out.write(data)
+        LastPrinted = followed
+      # for
+      out.flush()
+    # while
+  finally:
+    for followed in Followed: followed.close()
+    if watcher is not None: watcher.close()
+  # try ... finally
+# followFiles()
+
+
 # ------------------------------------------------------------------------------
 def cutLinesExec(args):
   
@@ -153,16 +863,59 @@ def cutLinesExec(args):
   Parser.add_argument("--lines", "-n", type=int,
     help="number of lines to be printed (if available); negative goes backward"
       " (default: print all)")
+  Parser.add_argument("--ranges", "-r", action="append", default=[],
+    help="comma-separated list of line ranges `START[-[STOP]][/STEP]` (e.g."
+      " `10-20,1000-1010,-50-,1-/100`), all selected in a single pass;"
+      " exclusive with the other line selection options; can be repeated;"
+      " a list starting from the end must be attached to the option, as in"
+      " `--ranges=-50-` or `-r-50-`")
+  Parser.add_argument("--from-pattern", "-F", dest="FromPattern",
+    help="start from the first line matching this regular expression"
+      " (exclusive with line number options)")
+  Parser.add_argument("--to-pattern", "-T", dest="ToPattern",
+    help="stop at the first line after the start one matching this regular"
+      " expression (exclusive with line number options)")
+  Parser.add_argument("--print-anchors", action="store_true",
+    dest="PrintAnchors",
+    help="print the number of the lines matched by `--from-pattern` and"
+      " `--to-pattern` (on standard error)")
   Parser.add_argument("--stdin", "-c", action="store_true", dest="use_stdin",
     help="reads from standard input AFTER reading all input files")
   Parser.add_argument("--nouncompress", "-C", action="store_true",
     dest="DontUncompress",
     help="don't uncompress gzip and bzip2 files [%(default)s]"
     )
+  Parser.add_argument("--jobs", "-j", type=int, default=1,
+    help="number of files processed in parallel; output is still in the order"
+      " of the input files [%(default)d]"
+    )
+  Parser.add_argument("--count", action="store_true",
+    help="just print the number of lines of each file (like `wc -l`)"
+    )
+  Parser.add_argument("--nocache", action="store_true",
+    default=bool(os.environ.get('CUT_LINES_NOCACHE')),
+    help="do not use the cache of line counts, kept in '%s' for files larger"
+      " than %d MiB (%d MiB if compressed), at most %d entries; also disabled"
+      " by setting the CUT_LINES_NOCACHE environment variable"
+      % (LineCountCacheDir, LineCountCacheMinSize >> 20,
+        LineCountCacheMinCompressedSize >> 20, LineCountCacheMaxEntries)
+    )
+  Parser.add_argument("--follow", "-f", action="store_true",
+    help="after printing the selected lines, keep printing the lines appended"
+      " to the files (like `tail -f`); rotated and truncated files are"
+      " followed by name"
+    )
+  Parser.add_argument("--sleep-interval", type=float, default=1.0,
+    help="with `--follow`, how often to check for new data when inotify is not"
+      " available, and for rotated files otherwise [%(default)g s]"
+    )
   
   Parser.add_argument("--unittest", "--test", action="store_true",
     help="run unit tests (ignoring all other options)"
     )
+  Parser.add_argument("--benchmark", action="store_true",
+    help="run benchmarks (see `--benchmark --help` for their options)"
+    )
   
   Parser.add_argument('--version', action="version",
     version="%(prog)s version {}".format(__version__)
@@ -170,7 +923,7 @@ def cutLinesExec(args):
   
   args = Parser.parse_args()
   
-  if args.unittest:
+  if args.unittest or args.benchmark:
     raise NotImplementedError \
       ("Internal error: test options should have been caught already!")
   #
@@ -185,36 +938,116 @@ def cutLinesExec(args):
      % (args.lines, args.stopline)
      )
   # if
+  
+  if args.ranges:
+    if args.startline != 1 or args.lines is not None \
+     or args.stopline is not None:
+      raise RuntimeError(
+       "Option `--ranges` is exclusive with `--startline`, `--stopline`"
+       " and `--lines`"
+       )
+    # if
+    try: Ranges = parseLineRanges(",".join(args.ranges))
+    except ValueError as e: raise RuntimeError(str(e))
+  else: Ranges = None
 
+  if args.FromPattern is not None or args.ToPattern is not None:
+    if Ranges is not None or args.startline != 1 or args.lines is not None \
+     or args.stopline is not None:
+      raise RuntimeError(
+       "Options `--from-pattern` and `--to-pattern` are exclusive with"
+       " `--ranges`, `--startline`, `--stopline` and `--lines`"
+       )
+    # if
+    if args.jobs > 1 or args.follow:
+      raise RuntimeError(
+       "Options `--from-pattern` and `--to-pattern` are exclusive with"
+       " `--jobs` and `--follow`"
+       )
+    # if
+    try:
+      Patterns = tuple(
+        None if pattern is None else re.compile(os.fsencode(pattern), re.M)
+        for pattern in ( args.FromPattern, args.ToPattern )
+        )
+    except re.error as e: raise RuntimeError(f"Invalid pattern: {e}")
+  else: Patterns = None
+  
+  if args.jobs < 1:
+    raise RuntimeError("Invalid number of jobs: %d" % args.jobs)
+  
   InputFiles = args.InputFiles[:]
 
   if len(InputFiles) == 0: args.use_stdin = True
   elif args.use_stdin is None: args.use_stdin = False
   
+  if args.count:
+    if args.follow:
+      raise RuntimeError("Options `--count` and `--follow` are exclusive")
+    if args.use_stdin: InputFiles.append(None)
+    for FileName in InputFiles:
+      if FileName is None: n = countFileLines(sys.stdin.buffer)
+      else:
+        n = countLines(FileName, uncompress=not args.DontUncompress,
+          useCache=not args.nocache)
+      # if ... else
+      print(n, "-" if FileName is None else FileName)
+    # for
+    return 0
+  # if count
+  
+  if args.follow:
+    if args.use_stdin:
+      raise RuntimeError("Option `--follow` does not support standard input")
+    if args.jobs > 1:
+      raise RuntimeError("Options `--follow` and `--jobs` are exclusive")
+    if not args.DontUncompress:
+      for FileName in InputFiles:
+        if FileName.endswith(( '.gz', '.bz2' )):
+          raise RuntimeError(
+            "Can't follow compressed file '%s' (see `--nouncompress`)"
+            % FileName
+            )
+      # for
+    # if
+    try: followFiles(InputFiles, args, Ranges)
+    except KeyboardInterrupt: pass
+    return 0
+  # if follow
+  
+  if args.jobs > 1 and InputFiles:
+    for FileName, Buffer \
+     in cutFilesInParallel(InputFiles, args, Ranges, nJobs=args.jobs):
+      printSelection(FileName, Buffer, verbose=args.verbose)
+    # for
+    InputFiles = [] # all done
+  # if parallel
+  
   if args.use_stdin: InputFiles.append(None)
   
   for FileName in InputFiles:
-    if FileName is None: File = sys.stdin
-    else:
-      try:
-        File = (open if args.DontUncompress else OPEN)(FileName, mode='r')
-      except IOError:
-        print("Can't open source file '%s'." % FileName, file=sys.stderr)
-        raise
+    if Patterns is not None:
+      File = openInputFile(FileName, args, binary=True)
+      anchors = {}
+      printSelection(FileName, cutPatternRange(File, *Patterns, anchors=anchors),
+        verbose=args.verbose, out=sys.stdout.buffer)
+      sys.stdout.buffer.flush()
+      if args.PrintAnchors:
+        print("%s: from line %s to line %s" % (
+          "Standard input" if FileName is None else ("'%s'" % FileName),
+          anchors.get('from', "(none)" if Patterns[0] else 1),
+          anchors.get('to', "(none)" if Patterns[1] else "(end)"),
+          ), file=sys.stderr)
+      # if
+      if FileName is not None: File.close()
+      continue
+    # if patterns
     
-    Buffer = cutLines(File,
-      startline=args.startline, lines=args.lines, stopline=args.stopline,
-      )
-    
-    if args.verbose:
-      print(80*"-", file=sys.stderr)
-      print(
-        "Standard input:" if FileName is None else ("File: '%s'" % FileName),
-        file=sys.stderr, flush=True
-        )
+    nLines = neededLineCount(FileName, args, Ranges)
+    File = openInputFile(FileName, args)
     
-    # note that lines have not been stripped!
-    for line in Buffer: print(line, end='')
+    printSelection(FileName, selectLines(File, args, Ranges, nLines=nLines),
+      verbose=args.verbose)
     
     # close input file - if not stdin!
     if FileName is not None: File.close()
@@ -225,12 +1058,167 @@ def cutLinesExec(args):
 
 
 # ------------------------------------------------------------------------------
+# ---  benchmarks
+# ------------------------------------------------------------------------------
+BenchmarkCases = {
+  # name: command line options, with `{N}` (lines in the file) and `{mid}`
+  # (half of them) replaced
+  "start > 0":              [ '-s', '{mid}' ],
+  "start > 0, lines > 0":   [ '-s', '{mid}', '-n', '1000' ],
+  "start > 0, lines < 0":   [ '-s', '{mid}', '-n', '-1000' ],
+  "start > 0, stop > 0":    [ '-s', '{mid}', '-S', '{N}' ],
+  "start > 0, stop < 0":    [ '-s', '{mid}', '-S', '-1000' ],
+  "start < 0":              [ '-s', '-1000' ],
+  "start < 0, lines > 0":   [ '-s', '-{mid}', '-n', '1000' ],
+  "start < 0, lines < 0":   [ '-s', '-1000', '-n', '-1000' ],
+  "start < 0, stop > 0":    [ '-s', '-{mid}', '-S', '{N}' ],
+  "start < 0, stop < 0":    [ '-s', '-{mid}', '-S', '-1000' ],
+  "ranges":                 [ '-r', '10-20,{mid}-/100,-50-' ],
+  "patterns":               [ '-F', '^{mid}$', '-T', '^{N}$' ],
+  "count":                  [ '--count' ],
+} # BenchmarkCases
+
+
+def generateBenchmarkFile(
+ path: "path of the file to create (`.gz` and `.bz2` are compressed)",
+ nLines: "number of lines to write",
+ blockLines: "number of lines written at once" = 1 << 16,
+ ):
+  """Writes a file where each line contains its own line number."""
+  with OPEN(path, mode='wb') as File:
+    for first in range(1, nLines + 1, blockLines):
+      last = min(first + blockLines, nLines + 1)
+      File.write(b"".join(b"%d\n" % i for i in range(first, last)))
+  # with
+# generateBenchmarkFile()
+
+
+# runs the program and then writes its peak memory usage [kiB] on a descriptor;
+# the peak usage reported by `wait4()` would include the one of the parent,
+# while the one of `/proc/self/status` is reset on `exec()`
+BenchmarkWrapper = """
+import sys, os, runpy, resource
+fd = int(sys.argv.pop(1))
+sys.argv = sys.argv[1:]
+try: runpy.run_path(sys.argv[0], run_name='__main__')
+finally:
+  try:
+    with open('/proc/self/status') as status:
+      peak = next(int(l.split()[1]) for l in status if l.startswith('VmHWM:'))
+  except (OSError, StopIteration):
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  os.write(fd, b'%d' % peak)
+"""
+
+def runBenchmarkCase(
+ options: "command line options for this program",
+ ) -> "elapsed time [s] and peak resident memory [kiB] of the process":
+  """Runs this program in a new process, measuring its time and memory."""
+  import subprocess
+  readFD, writeFD = os.pipe()
+  try:
+    start = time.perf_counter()
+    proc = subprocess.run(
+      [ sys.executable, '-c', BenchmarkWrapper, str(writeFD),
+        os.path.abspath(__file__), ] + options,
+      stdout=subprocess.DEVNULL, pass_fds=( writeFD, ),
+      )
+    elapsed = time.perf_counter() - start
+    os.close(writeFD)
+    writeFD = None
+    with os.fdopen(readFD, 'rb') as peakInfo: maxRSS = int(peakInfo.read())
+  finally:
+    if writeFD is not None:
+      os.close(writeFD)
+      os.close(readFD)
+    # if
+  # try ... finally
+  if proc.returncode != 0:
+    raise RuntimeError("Benchmark command failed (exit code %d): %s"
+      % (proc.returncode, " ".join(options)))
+  return elapsed, maxRSS
+# runBenchmarkCase()
+
+
+def cutLinesBenchmark(args):
+  
+  import argparse
+  import tempfile
+  
+  Parser = argparse.ArgumentParser(
+    description="Measures the time and memory needed to cut lines from"
+      " generated files of different sizes and compressions."
+    )
+  Parser.add_argument("--sizes", default="1e3,1e4,1e5,1e6",
+    help="comma-separated list of file sizes, in lines (up to 1e9) [%(default)s]"
+    )
+  Parser.add_argument("--compressions", default="plain,gz,bz2",
+    help="comma-separated list of file types (plain, gz, bz2) [%(default)s]"
+    )
+  Parser.add_argument("--cases", action="append", default=[],
+    help="run only this case (can be repeated; default: all of them: %s)"
+      % ", ".join(f"'{case}'" for case in BenchmarkCases)
+    )
+  Parser.add_argument("--cache", action="store_true",
+    help="allow caching the line counts (by default they are always computed)"
+    )
+  Parser.add_argument("--workdir",
+    help="directory where to generate the test files (default: temporary)"
+    )
+  
+  args = Parser.parse_args(args[1:])
+  
+  sizes = [ int(float(size)) for size in args.sizes.split(',') ]
+  compressions = args.compressions.split(',')
+  for compression in compressions:
+    if compression not in ( 'plain', 'gz', 'bz2' ):
+      raise RuntimeError(f"Unsupported compression: '{compression}'")
+  # for
+  cases = args.cases if args.cases else list(BenchmarkCases)
+  for case in cases:
+    if case not in BenchmarkCases:
+      raise RuntimeError(f"Unknown benchmark case: '{case}'")
+  # for
+  
+  header = f"{'lines':>10s} {'type':>5s}  {'case':<22s} {'time [s]':>9s}" \
+    f" {'Mlines/s':>9s} {'RSS [MiB]':>9s}"
+  print(header)
+  print("-" * len(header))
+  with tempfile.TemporaryDirectory(dir=args.workdir) as workDir:
+    for nLines in sizes:
+      for compression in compressions:
+        FileName = os.path.join(workDir, f"lines{nLines}.txt")
+        if compression != 'plain': FileName += '.' + compression
+        generateBenchmarkFile(FileName, nLines)
+        
+        for case in cases:
+          options = [
+            option.format(N=nLines, mid=max(nLines // 2, 1))
+            for option in BenchmarkCases[case]
+            ]
+          if not args.cache: options.append('--nocache')
+          elapsed, maxRSS = runBenchmarkCase(options + [ FileName ])
+          print(f"{nLines:10d} {compression:>5s}  {case:<22s} {elapsed:9.3f}"
+            f" {nLines / elapsed / 1e6:9.3f} {maxRSS / 1024:9.1f}", flush=True)
+        # for cases
+        os.remove(FileName)
+      # for compressions
+    # for sizes
+  # with
+  return 0
+# cutLinesBenchmark()
+
 
 # ------------------------------------------------------------------------------
-# ---  main dispatcher: run program or tests
+# ---  main dispatcher: run program, benchmarks or tests
 # ------------------------------------------------------------------------------
 if __name__ == '__main__':
   
+  if '--benchmark' in sys.argv:
+    sys.argv.remove('--benchmark')
+    sys.exit(cutLinesBenchmark(sys.argv))
+  # if
+  
   for testOption in ( '--test', '--unittest' ):
     if testOption not in sys.argv: continue
     sys.argv.remove(testOption)
@@ -427,6 +1415,10 @@ if __name__ == '__main__':
       # self.assertEqual(len(selected), len(expected))
       self.assertEqual(selected, expected)
       
+      # same with the number of lines known in advance
+      selected = cutLines(data, nLines=len(data), **(params['args']))
+      self.assertEqual(selected, expected)
+      
     # runTest()
     
     def tests(self):
@@ -438,6 +1430,340 @@ if __name__ == '__main__':
     
   # class Tests
 
+  
+  class RangeTests(unittest.TestCase):
+    
+    TestDataLength = 10
+    TestSettings = {
+      # range specification: expected indices in the test data
+      "2-4":             [ 1, 2, 3 ],
+      "2-4,3-6":         [ 1, 2, 3, 4, 5 ],
+      "8-,1":            [ 0, 7, 8, 9 ],
+      "-3-":             [ 7, 8, 9 ],
+      "-3":              [ 7 ],
+      "3--3":            [ 2, 3, 4, 5, 6, 7 ],
+      "-5--2":           [ 5, 6, 7, 8 ],
+      "1-/3":            [ 0, 3, 6, 9 ],
+      "-4-/2":           [ 6, 8 ],
+      "2-8/3,5-6":       [ 1, 4, 5, 7 ],
+      "9-20":            [ 8, 9 ],
+      "2-3,-2-":         [ 1, 2, 8, 9 ],
+      "-20-2":           [ 0, 1 ],
+      "5-2":             [],
+    } # TestSettings
+    
+    def tests(self):
+      data = list(range(RangeTests.TestDataLength))
+      for spec, expected in RangeTests.TestSettings.items():
+        with self.subTest(spec, exp=expected):
+          selected = list(cutLineRanges(data, parseLineRanges(spec)))
+          self.assertEqual(selected, [ data[i] for i in expected ])
+      # for
+    # tests()
+    
+    def testEarlyStop(self):
+      import itertools
+      selected = cutLineRanges(itertools.count(), parseLineRanges("2-4,3"))
+      self.assertEqual(list(selected), [ 1, 2, 3 ])
+    # testEarlyStop()
+    
+    def testInvalid(self):
+      for spec in ( "0", "3-0", "a-b", "2-5/0", "1--", ):
+        with self.subTest(spec):
+          self.assertRaises(ValueError, parseLineRanges, spec)
+      # for
+    # testInvalid()
+  
+  # class RangeTests
+
+
+  class PatternTests(unittest.TestCase):
+    
+    TestData = b"".join(b"line %d\n" % i for i in range(1, 31)) + b"end"
+    TestSettings = [
+      # from, to: expected first and last line (None: nothing selected)
+      ( rb'^line 5$',  rb'^line 12$', ( 5, 12 ) ),
+      ( rb'line 2',    rb'line 2',    ( 2, 20 ) ),
+      ( None,          rb'3$',        ( 1, 3 ) ),
+      ( rb'line 29',   None,          ( 29, 31 ) ),
+      ( rb'^line 7$',  rb'nowhere',   ( 7, 31 ) ),
+      ( rb'nowhere',   rb'line 3',    None ),
+      ( rb'^end',      rb'line',      ( 31, 31 ) ),
+    ] # TestSettings
+    
+    def tests(self):
+      import io
+      lines = PatternTests.TestData.splitlines(keepends=True)
+      for fromPattern, toPattern, expected in PatternTests.TestSettings:
+        for blockSize in ( 1, 7, 64, 1 << 20 ):
+          with self.subTest(fromPattern=fromPattern, toPattern=toPattern,
+           blockSize=blockSize):
+            anchors = {}
+            selected = b"".join(cutPatternRange(
+              io.BytesIO(PatternTests.TestData),
+              fromPattern=fromPattern and re.compile(fromPattern, re.M),
+              toPattern=toPattern and re.compile(toPattern, re.M),
+              anchors=anchors, blockSize=blockSize,
+              ))
+            if expected is None:
+              self.assertEqual(selected, b"")
+              continue
+            # if
+            first, last = expected
+            self.assertEqual(selected, b"".join(lines[first-1:last]))
+            if fromPattern: self.assertEqual(anchors['from'], first)
+            if toPattern and last < len(lines):
+              self.assertEqual(anchors['to'], last)
+          # with
+        # for block size
+      # for
+    # tests()
+    
+  # class PatternTests
+  
+  
+  class CountTests(unittest.TestCase):
+    
+    def tests(self):
+      import io
+      for data, expected in (
+        ( b"", 0 ), ( b"\n", 1 ), ( b"a", 1 ), ( b"a\nb\n", 2 ), ( b"a\n\nb", 3 ),
+        ):
+        with self.subTest(data=data):
+          self.assertEqual(countFileLines(io.BytesIO(data), blockSize=2), expected)
+      # for
+    # tests()
+    
+    def testCache(self):
+      import tempfile
+      global LineCountCacheDir, LineCountCacheMinSize
+      saved = LineCountCacheDir, LineCountCacheMinSize
+      try:
+        with tempfile.TemporaryDirectory() as workDir:
+          LineCountCacheDir = os.path.join(workDir, 'cache')
+          FileNames = [ os.path.join(workDir, 'data%d.txt' % i) for i in range(5) ]
+          for i, FileName in enumerate(FileNames):
+            with open(FileName, 'w') as File: File.write("line\n" * i)
+          
+          LineCountCacheMinSize = 1 << 20 # small files are not cached
+          self.assertEqual(countLines(FileNames[3]), 3)
+          self.assertFalse(os.path.exists(LineCountCacheDir))
+          
+          LineCountCacheMinSize = 0
+          for i, FileName in enumerate(FileNames):
+            self.assertEqual(countLines(FileName), i)
+            CacheFile = os.path.join(LineCountCacheDir, hashlib.sha1(
+              os.fsencode(os.path.realpath(FileName))).hexdigest())
+            os.utime(CacheFile, ns=( i * 10**9, i * 10**9 )) # least recent first
+          # for
+          self.assertEqual(len(os.listdir(LineCountCacheDir)), 5)
+          self.assertEqual(trimLineCountCache(2), 3)
+          self.assertEqual(len(os.listdir(LineCountCacheDir)), 2)
+          self.assertEqual(countLines(FileNames[4], cachedOnly=True), 4)
+          self.assertIsNone(countLines(FileNames[0], cachedOnly=True))
+        # with
+      finally: LineCountCacheDir, LineCountCacheMinSize = saved
+    # testCache()
+    
+  # class CountTests
+  
+  
+  class FollowTests(unittest.TestCase):
+    
+    def testRotation(self):
+      import tempfile
+      with tempfile.TemporaryDirectory() as workDir:
+        FileName = os.path.join(workDir, 'log')
+        with open(FileName, 'wb') as File: File.write(b"old 1\n")
+        followed = FollowedFile(FileName, open(FileName, 'rb'))
+        try:
+          self.assertEqual(followed.read(), b"old 1\n")
+          self.assertIsNone(followed.checkReplaced())
+          with open(FileName, 'ab') as File: File.write(b"old 2\nold 3 (partial")
+          self.assertEqual(followed.read(), b"old 2\n")
+          # more data written after the last read, then rotation
+          with open(FileName, 'ab') as File: File.write(b" line)")
+          os.rename(FileName, FileName + '.1')
+          self.assertIsNone(followed.checkReplaced()) # not replaced yet
+          with open(FileName, 'wb') as File: File.write(b"new 1\nnew 2")
+          data = followed.read()
+          data += followed.checkReplaced() + followed.read()
+          self.assertEqual(data, b"old 3 (partial line)\nnew 1\n")
+          # truncation
+          with open(FileName, 'wb') as File: File.write(b"x\n")
+          self.assertEqual(followed.checkReplaced(), b"")
+          self.assertEqual(followed.read(), b"x\n")
+        finally: followed.close()
+      # with
+    # testRotation()
+    
+  # class FollowTests
+  
+  
+  class DifferentialTests(unittest.TestCase):
+    """Randomized comparison of all the selection paths with list slicing."""
+    
+    Seed = 20261019
+    nTrials = 3000
+    
+    @staticmethod
+    def referenceCut(data, startline, lines, stopline):
+      N = len(data)
+      if startline > 0:
+        if stopline is not None:
+          if stopline > 0: return data[startline-1:stopline]
+          else:            return data[startline-1:][:stopline]
+        # if
+        if lines is None: return data[startline-1:]
+        if lines >= 0: return data[startline-1:startline-1+lines]
+        if startline < -lines + 1: return data[:startline]
+        return data[startline-1+lines:startline-1]
+      else:
+        tail = data[max(N + startline, 0):]
+        if stopline is not None:
+          if stopline > 0: return tail[:stopline + 1 - (N + startline)]
+          else:            return tail[:max(stopline - startline, 0)]
+        # if
+        if lines is None: return tail
+        if lines >= 0: return tail[:lines]
+        return data[max(N + startline + lines, 0):][:-lines]
+      # if ... else
+    # referenceCut()
+    
+    @staticmethod
+    def referenceRanges(data, ranges):
+      N = len(data)
+      selected = set()
+      for start, stop, step in ranges:
+        first = start if start > 0 else N + 1 + start
+        if stop is None: last = N
+        else:            last = stop if stop > 0 else N + 1 + stop
+        selected.update(i for i in range(first, last + 1, step) if 1 <= i <= N)
+      # for
+      return [ data[i-1] for i in sorted(selected) ]
+    # referenceRanges()
+    
+    @staticmethod
+    def randomLine(rnd, N):
+      return rnd.choice(( 1, -1 )) * rnd.randint(1, N + 3)
+    
+    def testCutLines(self):
+      import random
+      rnd = random.Random(DifferentialTests.Seed)
+      for iTrial in range(DifferentialTests.nTrials):
+        N = rnd.randint(0, 25)
+        data = list(range(N))
+        startline = self.randomLine(rnd, N)
+        lines, stopline = None, None
+        choice = rnd.randint(0, 2)
+        if choice == 1:   lines = rnd.randint(-N - 3, N + 3)
+        elif choice == 2: stopline = self.randomLine(rnd, N)
+        args = dict(startline=startline, lines=lines, stopline=stopline)
+        expected = self.referenceCut(data, **args)
+        with self.subTest(iTrial=iTrial, N=N, **args):
+          self.assertEqual(cutLines(data, **args), expected)
+          self.assertEqual(cutLines(iter(data), **args), expected)
+          self.assertEqual(cutLines(iter(data), nLines=N, **args), expected)
+        # with
+      # for
+    # testCutLines()
+    
+    def testCutLineRanges(self):
+      import random
+      rnd = random.Random(DifferentialTests.Seed)
+      for iTrial in range(DifferentialTests.nTrials):
+        N = rnd.randint(0, 25)
+        data = list(range(N))
+        specs = []
+        for iRange in range(rnd.randint(1, 4)):
+          spec = str(self.randomLine(rnd, N))
+          choice = rnd.randint(0, 2)
+          if choice == 1:   spec += '-'
+          elif choice == 2: spec += '-' + str(self.randomLine(rnd, N))
+          if rnd.randint(0, 2) == 0: spec += '/' + str(rnd.randint(1, 4))
+          specs.append(spec)
+        # for
+        spec = ",".join(specs)
+        ranges = parseLineRanges(spec)
+        expected = self.referenceRanges(data, ranges)
+        with self.subTest(iTrial=iTrial, N=N, spec=spec):
+          self.assertEqual(list(cutLineRanges(iter(data), ranges)), expected)
+          self.assertEqual(
+            list(cutLineRanges(iter(data), ranges, nLines=N)), expected)
+        # with
+      # for
+    # testCutLineRanges()
+    
+    def testPatternsAndCount(self):
+      import random, io
+      rnd = random.Random(DifferentialTests.Seed)
+      patterns = [ None ] + [ re.compile(p, re.M) for p in ( rb'^a', rb'b$', rb'ab', rb'^$' ) ]
+      for iTrial in range(DifferentialTests.nTrials):
+        data = bytes(rnd.choice(b"ab\n") for i in range(rnd.randint(0, 40)))
+        lines = data.splitlines(keepends=True)
+        fromPattern, toPattern = rnd.choice(patterns), rnd.choice(patterns)
+        blockSize = rnd.randint(1, 50)
+        
+        first = 0 if fromPattern is None else next((i for i, line in enumerate(lines)
+          if fromPattern.search(line.rstrip(b'\n'))), None)
+        if first is None: expected = b""
+        else:
+          searchFrom = first if fromPattern is None else first + 1
+          last = len(lines) if toPattern is None else next((i + 1
+            for i, line in enumerate(lines[searchFrom:], searchFrom)
+            if toPattern.search(line.rstrip(b'\n'))), len(lines))
+          expected = b"".join(lines[first:last])
+        # if ... else
+        with self.subTest(iTrial=iTrial, data=data, blockSize=blockSize,
+         fromPattern=fromPattern, toPattern=toPattern):
+          selected = b"".join(cutPatternRange(io.BytesIO(data),
+            fromPattern=fromPattern, toPattern=toPattern, blockSize=blockSize))
+          self.assertEqual(selected, expected)
+          self.assertEqual(
+            countFileLines(io.BytesIO(data), blockSize=blockSize), len(lines))
+        # with
+      # for
+    # testPatternsAndCount()
+    
+    def testFiles(self):
+      import random, tempfile, argparse
+      global LineCountCacheDir, LineCountCacheMinSize, \
+        LineCountCacheMinCompressedSize
+      rnd = random.Random(DifferentialTests.Seed)
+      saved = ( LineCountCacheDir, LineCountCacheMinSize,
+        LineCountCacheMinCompressedSize, )
+      try:
+        with tempfile.TemporaryDirectory() as workDir:
+          LineCountCacheDir = os.path.join(workDir, 'cache')
+          LineCountCacheMinSize = LineCountCacheMinCompressedSize = 0
+          for iTrial in range(DifferentialTests.nTrials // 30):
+            N = rnd.randint(0, 25)
+            data = [ b"%d\n" % i for i in range(1, N + 1) ]
+            FileName = os.path.join(workDir,
+              "data%d.txt%s" % (iTrial, rnd.choice(( '', '.gz', '.bz2' ))))
+            with OPEN(FileName, 'wb') as File: File.writelines(data)
+            startline = self.randomLine(rnd, N)
+            stopline = self.randomLine(rnd, N) if rnd.randint(0, 1) else None
+            options = argparse.Namespace(startline=startline, lines=None,
+              stopline=stopline, DontUncompress=False, nocache=False)
+            expected = [ line.decode() for line
+              in self.referenceCut(data, startline, None, stopline) ]
+            with self.subTest(iTrial=iTrial, FileName=FileName, N=N,
+             startline=startline, stopline=stopline):
+              for i in range(2): # second time with the cached line count
+                self.assertEqual(cutFile(FileName, options), expected)
+              self.assertEqual(countLines(FileName), N)
+            # with
+          # for
+        # with
+      finally:
+        LineCountCacheDir, LineCountCacheMinSize, \
+          LineCountCacheMinCompressedSize = saved
+      # try ... finally
+    # testFiles()
+    
+  # class DifferentialTests
+  
   assert len(Tests.TestSettings) == 12;
   unittest.main()
 
@@ -13,47 +13,89 @@
 #   added sorting, print of start and end of the region
 # 2.0 (20241122 petrillo@slac.stanford.edu)
 #   converted to Python3 (and argparse)
+# 2.1 (20261019)
+#   added watch mode;
+#   added resident memory accounting from smaps;
+#   added survey of all processes;
+#   columnar parser of map files;
+#   fragmentation report;
+#   snapshot archive and diff;
+#   structured output formats;
+#   page residency of the mappings
 #
 
 import sys, os
+import re
+import heapq
+import time
+import itertools
+import operator
+import struct
+import json
+import csv
+import ctypes
+import mmap
+from array import array
+import fnmatch
+from concurrent.futures import ThreadPoolExecutor
 import gzip
 try: import bz2
 except ImportError: pass
 
 import argparse
 
-__version__ = "2.0"
+try: import numpy
+except ImportError: numpy = None
+
+__version__ = "2.1"
 __doc__ = """
 ProcID can be either a running process ID (in which case a memory map
 /procs/ProcID/maps is used), or directly the map in a file.
+With --smaps, /procs/ProcID/smaps is used instead, and the resident memory
+of each mapping is reported too.
+
+Snapshots stored with --snapshot are compared with:
+%(prog)s diff ARCHIVE [FROM] [TO]
 
 """
 
 SortKey_Size, SortKey_Start, SortKey_Path \
   = [ 'mapsize', 'start', 'path' ]
 
-SortKeys = [ SortKey_Size, SortKey_Start, SortKey_Path ]
+# smaps fields which are reported, and their sort keys
+SmapsFields = {
+  'Rss': 'rss', 'Pss': 'pss', 'Private_Dirty': 'dirty', 'Swap': 'swap',
+}
+
+SortKeys = [ SortKey_Size, SortKey_Start, SortKey_Path ] \
+  + list(SmapsFields.values())
 DefaultSort = SortKey_Size
+DefaultSmapsSort = SmapsFields['Rss']
+
+# begin, end, permissions, offset, device, inode, path (all the rest, which
+# may include spaces and a " (deleted)" suffix); shared by all the parsers
+MapLinePattern = re.compile(
+  r'^([0-9a-f]+)-([0-9a-f]+) (\S+) ([0-9a-f]+) (\S+) (\d+) *(.*)$', re.M)
 
 ################################################################################
 class MapDataClass:
   def __init__(self, s):
-    Tokens = s.split()
-    self.address = Tokens[0]
-    hexBegin, hexEnd = self.address.split('-')
+    match = MapLinePattern.match(s)
+    if match is None: raise ValueError(f"Invalid memory map line: '{s}'")
+    hexBegin, hexEnd, self.perms, offset, self.dev, inode, self.path \
+      = match.groups()
+    self.address = hexBegin + '-' + hexEnd
     self.begin = int(hexBegin, 16)
     self.end = int(hexEnd, 16)
-    self.perms = Tokens[1]
-    self.offset = int(Tokens[2], 16)
-    self.dev = Tokens[3]
-    self.inode = int(Tokens[4])
-    try:               self.path = Tokens[5]
-    except IndexError: self.path = ""
+    self.offset = int(offset, 16)
+    self.inode = int(inode)
+    self.smaps = None # smaps fields (in bytes), if available
   # __init__()
   
   def size(self): return self.end - self.begin
   def start(self): return self.begin
   def stop(self): return self.end
+  def smapsValue(self, field): return self.smaps.get(field, 0) if self.smaps else 0
 # class MapDataClass
 
 class MapDataListClass:
@@ -78,101 +120,308 @@ class MapDataListClass:
   
   @staticmethod
   def ComputeRangeAndSize(data):
-    if len(data) < 2: return 0
-    start_sorted = sorted(data, None, lambda d: d.start(), True)
-    
-    size = MapDataListClass.ComputeSize(start_sorted)
-    
-    return start_sorted[0].start(), start_sorted[-1].stop(), size
+    if not data: return None, None, 0
+    return min(d.start() for d in data), max(d.stop() for d in data), \
+      MapDataListClass.ComputeSize(data)
   # ComputeRangeAndSize()
   
   @staticmethod
   def ComputeHole(data):
+    if not data: return 0
     begin, end, size = MapDataListClass.ComputeRangeAndSize(data)
-    return end - begin - sizw
+    return end - begin - size
   # ComputeHole()
   
   def size(self): return self.ComputeSize(self.data)
   
+  def smapsValue(self, field):
+    return sum(datum.smapsValue(field) for datum in self.data)
+  
   def hole(self): return self.ComputeHole(self.data)
   
-  def start(self):
-    if not self.data: return None
-    if len(self.data) == 1: return self.data[0].start()
-    
-    size_sorted = sorted(self.data, None, lambda d: d.size())
-  #  start_sorted = sorted(self.data, None, lambda d: d.start(), True)
-    
-    for iDatum in range(0, len(size_sorted) - 1):
-      start, end, size = self.ComputeRangeAndSize(self.data[iDatum:])
-      if (end - start) < 2*size: return start
-    # for
-    return None
-  # start()
+  def compactRange(self):
+    return CompactRange([ d.start() for d in self.data ],
+      [ d.stop() for d in self.data ])
+  # compactRange()
   
-  def stop(self):
-    if not self.data: return None
-    if len(self.data) == 1: return self.data[0].stop()
-    
-    size_sorted = sorted(self.data, None, lambda d: d.size())
-  #  end_sorted = sorted(self.data, None, lambda d: d.end(), True)
-    
-    for iDatum in range(0, len(size_sorted) - 1):
-      start, end, size = self.ComputeRangeAndSize(self.data[iDatum:])
-      if (end - start) < 2*size: return end
-    # for
-    return None
-  # stop()
+  def start(self): return self.compactRange()[0]
+  
+  def stop(self): return self.compactRange()[1]
   
 # class MapDataClass
 
 
-def OPEN(Path, mode = 'r'):
-  if Path.endswith('.bz2'): return bz2.BZ2File(Path, mode)
-  if Path.endswith('.gz'): return gzip.GzipFile(Path, mode)
+def OPEN(Path, mode = 'rt'):
+  if Path.endswith('.bz2'): return bz2.open(Path, mode)
+  if Path.endswith('.gz'): return gzip.open(Path, mode)
   return open(Path, mode)
 # OPEN()
 
 def PadStringLeft(s, padding): return " " * (padding - len(s)) + s
 
 
-def PrintMemoryMap(ProcessMemPath, options):
+def ReadMemoryMap(ProcessMemPath, Cache = None):
+  """Returns the list of mappings (`MapDataClass`) in the map file.
   
-  MapFile = OPEN(ProcessMemPath)
-  
-  nPages = 0
-  TotalMemory = 0
+  The file can be in either `maps` or `smaps` format; in the latter case,
+  the fields in `SmapsFields` are also stored in each mapping.
+  If a `Cache` dictionary is specified, the objects for lines already in it
+  are reused, and then it is updated to hold only the current lines.
+  """
   MemPages = []
-  for line in MapFile:
+  NewCache = {}
+  MemPage = None
+  with OPEN(ProcessMemPath) as MapFile:
+    for line in MapFile:
+      # smaps field lines are "Name: value [kB]", with no space in the name
+      name, colon, value = line.partition(':')
+      if colon and ' ' not in name:
+        if name in SmapsFields and MemPage is not None:
+          MemPage.smaps[name] = int(value.split()[0]) * 1024
+        continue
+      # if smaps field
+      line = line.strip()
+      if not line: continue
+      MemPage = Cache.get(line) if Cache is not None else None
+      if MemPage is None: MemPage = MapDataClass(line)
+      MemPage.smaps = {}
+      NewCache[line] = MemPage
+      MemPages.append(MemPage)
+    # for
+  # with
+  if Cache is not None:
+    Cache.clear()
+    Cache.update(NewCache)
+  # if
+  return MemPages
+# ReadMemoryMap()
+
+
+def GroupMemoryMap(MemPages):
+  """Returns a dictionary path -> `MapDataListClass` of the mappings."""
+  MappedMem = {}
+  for MemPage in MemPages:
+    try: MapDataList = MappedMem[MemPage.path]
+    except KeyError:
+      MapDataList = MapDataListClass(MemPage.path)
+      MappedMem[MemPage.path] = MapDataList
+    # try ... except
+    MapDataList.append(MemPage)
+  # for
+  return MappedMem
+# GroupMemoryMap()
+
+
+def CompactRange(begins, ends):
+  """Returns the (start, stop) addresses of the core of a group of mappings.
+  
+  The smallest mappings are left out one at a time, until the remaining ones
+  (at least two) cover at least half of the address range they span.
+  Returns ( None, None ) if that never happens.
+  The mappings are sorted by size only once, and the range and size of all
+  the remaining mappings at each step are computed as running minimum,
+  maximum and sum from the largest mapping down.
+  """
+  n = len(begins)
+  if n == 0: return None, None
+  if n == 1: return begins[0], ends[0]
+  if numpy is not None:
+    # addresses in the top half of the 64-bit space do not fit int64
+    begins = numpy.asarray(begins, dtype=numpy.uint64)
+    ends = numpy.asarray(ends, dtype=numpy.uint64)
+    order = numpy.argsort(ends - begins, kind='stable')[::-1]
+    starts = numpy.minimum.accumulate(begins[order])[::-1]
+    stops = numpy.maximum.accumulate(ends[order])[::-1]
+    sizes = numpy.cumsum((ends - begins)[order])[::-1]
+    compact = (stops[:-1] - starts[:-1]) < 2 * sizes[:-1]
+    if not compact.any(): return None, None
+    i = int(numpy.argmax(compact))
+    return int(starts[i]), int(stops[i])
+  # if numpy
+  
+  order = sorted(range(n), key=lambda i: ends[i] - begins[i])
+  start, stop, size = None, None, 0
+  steps = []
+  for i in reversed(order):
+    start = begins[i] if start is None else min(start, begins[i])
+    stop = ends[i] if stop is None else max(stop, ends[i])
+    size += ends[i] - begins[i]
+    steps.append(( start, stop, size ))
+  # for
+  for start, stop, size in reversed(steps[1:]):
+    if (stop - start) < 2*size: return start, stop
+  return None, None
+# CompactRange()
+
+
+class MapGroupClass:
+  """Summary of the mappings of a path, from a `MapTableClass`."""
+  __slots__ = ( 'path', 'begins', 'ends', '_size', '_range', )
+  
+  def __init__(self, path, begins, ends, size):
+    self.path = path
+    self.begins = begins
+    self.ends = ends
+    self._size = size
+    self._range = None
+  # __init__()
+  
+  def __len__(self): return len(self.begins)
+  
+  def size(self): return self._size
+  def start(self): return self.compactRange()[0]
+  def stop(self): return self.compactRange()[1]
+  def smapsValue(self, field): return 0
+  
+  def span(self):
+    """Size of the address range from the first to the last mapping."""
+    if len(self.begins) == 0: return 0
+    return int(max(self.ends)) - int(min(self.begins))
+  # span()
+  
+  def hole(self): return self.span() - self.size()
+  
+  def compactRange(self):
+    if self._range is None: self._range = CompactRange(self.begins, self.ends)
+    return self._range
+  # compactRange()
+  
+# class MapGroupClass
+
+
+class MapTableClass:
+  """All the mappings of a map file, in columns.
+  
+  The file is parsed with a single regular expression pass; addresses,
+  offsets and inodes are stored as integer columns (`numpy` arrays if
+  available, `array` otherwise), and the other fields as lists.
+  """
+  def __init__(self, content):
+    fields = MapLinePattern.findall(content)
+    begins, ends, self.perms, offsets, self.devs, inodes, self.paths \
+      = map(list, zip(*fields)) if fields else ([],) * 7
+    if numpy is not None:
+      Column = lambda values: numpy.array(values, dtype=numpy.uint64)
+    else:
+      Column = lambda values: array('Q', values)
+    self.begins = Column(list(map(int, begins, itertools.repeat(16))))
+    self.ends = Column(list(map(int, ends, itertools.repeat(16))))
+    self.offsets = Column(list(map(int, offsets, itertools.repeat(16))))
+    self.inodes = Column(list(map(int, inodes)))
+  # __init__()
+  
+  def __len__(self): return len(self.paths)
+  
+  def sizes(self):
+    if numpy is not None: return self.ends - self.begins
+    return array('Q', map(operator.sub, self.ends, self.begins))
+  # sizes()
+  
+  def totalSize(self): return int(sum(self.sizes()))
+  
+  def countPages(self):
+    return sum(1 for size in self.sizes() if size > 0) if numpy is None \
+      else int(numpy.count_nonzero(self.sizes()))
+  # countPages()
+  
+  def groups(self):
+    """Returns a list of `MapGroupClass`, one per path."""
+    groupOf = {}
+    groupIndex = [ groupOf.setdefault(path, len(groupOf)) for path in self.paths ]
+    paths = list(groupOf)
+    if numpy is None:
+      members = [ [] for path in paths ]
+      for i, iGroup in enumerate(groupIndex): members[iGroup].append(i)
+      return [ MapGroupClass(path,
+          [ self.begins[i] for i in indices ], [ self.ends[i] for i in indices ],
+          sum(self.ends[i] - self.begins[i] for i in indices))
+        for path, indices in zip(paths, members) ]
+    # if no numpy
     
-    MemPage = MapDataClass(line.strip())
-    MemPages.append(MemPage)
+    groupIndex = numpy.array(groupIndex, dtype=numpy.intp)
+    order = numpy.argsort(groupIndex, kind='stable')
+    firsts = numpy.r_[0, numpy.flatnonzero(numpy.diff(groupIndex[order])) + 1]
+    begins = self.begins[order]
+    ends = self.ends[order]
+    sizes = numpy.add.reduceat(ends - begins, firsts)
+    lasts = numpy.r_[firsts[1:], len(order)]
+    return [ MapGroupClass(paths[iGroup], begins[first:last], ends[first:last],
+        int(size))
+      for iGroup, (first, last, size) in enumerate(zip(firsts, lasts, sizes)) ]
+  # groups()
+  
+  def holes(self):
+    """Returns the free gaps between mappings, sorted by address.
     
-    size = MemPage.size()
-    if size <= 0: continue
+    Each gap is (start, stop, mapping before, mapping after), with the two
+    mappings as indices in the table. Mappings are sorted by address once,
+    and gaps found in a linear sweep.
+    """
+    if len(self) < 2: return []
+    if numpy is not None:
+      order = numpy.argsort(self.begins, kind='stable')
+      begins = self.begins[order]
+      reach = numpy.maximum.accumulate(self.ends[order])
+      iGaps = numpy.flatnonzero(begins[1:] > reach[:-1])
+      return list(zip(reach[iGaps].tolist(), begins[iGaps + 1].tolist(),
+        order[iGaps].tolist(), order[iGaps + 1].tolist()))
+    # if numpy
     
-    nPages += 1
-    TotalMemory += size
-  # for
+    order = sorted(range(len(self)), key=self.begins.__getitem__)
+    gaps = []
+    reach, iReach = self.ends[order[0]], order[0]
+    for i in order[1:]:
+      if self.begins[i] > reach:
+        gaps.append(( reach, self.begins[i], iReach, i ))
+      if self.ends[i] > reach: reach, iReach = self.ends[i], i
+    # for
+    return gaps
+  # holes()
+  
+  @staticmethod
+  def FromFile(ProcessMemPath):
+    with OPEN(ProcessMemPath) as MapFile: return MapTableClass(MapFile.read())
+  
+# class MapTableClass
+
+
+def PrintMemoryMap(ProcessMemPath, options):
   
-  # produce the list of items to print
+  nPages = 0
+  TotalMemory = 0
+  TotalSmaps = dict.fromkeys(SmapsFields, 0)
   ItemsList = None
-  if options.DontGroup:
-    ItemsList = MemPages
-  else:
-    # group
-    MappedMem = {}
+  if options.DontGroup or options.Smaps:
+    MemPages = ReadMemoryMap(ProcessMemPath)
+    
     for MemPage in MemPages:
-      try: MapDataList = MappedMem[MemPage.path]
-      except KeyError:
-        MapDataList = MapDataListClass(MemPage.path)
-        MappedMem[MemPage.path] = MapDataList
-      # try ... except
-      MapDataList.append(MemPage)
+      size = MemPage.size()
+      if size <= 0: continue
+      
+      nPages += 1
+      TotalMemory += size
+      for field in TotalSmaps: TotalSmaps[field] += MemPage.smapsValue(field)
     # for
-    ItemsList = MappedMem.values()
+    
+    # produce the list of items to print
+    if options.DontGroup:
+      ItemsList = MemPages
+    else:
+      ItemsList = GroupMemoryMap(MemPages).values()
+    # if ... else
+  else:
+    # plain grouped maps: columnar parsing
+    MapTable = MapTableClass.FromFile(ProcessMemPath)
+    nPages = MapTable.countPages()
+    TotalMemory = MapTable.totalSize()
+    ItemsList = MapTable.groups()
   # if ... else
   
+  if options.OutputFormat != 'table':
+    WriteMemoryMapRecords(ProcessMemPath, ItemsList, options)
+    return TotalMemory
+  # if structured output
+  
   # collect the items to be printed
   SortKeys = []
   TotalIndex = None
@@ -189,6 +438,15 @@ def PrintMemoryMap(ProcessMemPath, options):
     Items.append(f"{dataList.size()//1024:8d} KiB")
     if SortKeyIndex is None: SortKeys.append(SortKey_Size)
     
+    if options.Smaps:
+      for field, sortKey in SmapsFields.items():
+        Items.append(f"{dataList.smapsValue(field)//1024:8d} KiB")
+        if SortKeyIndex is None: SortKeys.append(sortKey)
+      # for
+      # the progressive total is of the resident memory
+      Items[TotalIndex] = dataList.smapsValue('Rss')
+    # if smaps
+    
     if options.PrintStart:
       start = dataList.start()
       if start is None:
@@ -203,7 +461,7 @@ def PrintMemoryMap(ProcessMemPath, options):
       if stop is None:
         Items.append("%18s" % "   (varies)   ")
       else:
-        Items.append(PadStringLeft(f"0x{stop}", 18))
+        Items.append(PadStringLeft(f"0x{stop:x}", 18))
       if SortKeyIndex is None: SortKeys.append(SortKey_Start)
     # if
     
@@ -226,7 +484,7 @@ def PrintMemoryMap(ProcessMemPath, options):
     if reverse: SortKey = SortKey[1:]
     try: sortIndex = SortKeyIndex[SortKey]
     except KeyError: raise Exception(f"Invalid sort key: '{SortKey}'")
-    Content.sort(key=lambda r: r[sortIndex], reverse=True)
+    Content.sort(key=lambda r: r[sortIndex], reverse=not reverse)
   # for
   
   # add the total
@@ -244,18 +502,875 @@ def PrintMemoryMap(ProcessMemPath, options):
   # ... and a summary
   print(f"{ProcessMemPath}: {TotalMemory} bytes"
     f" ({TotalMemory/1048576:.2f} MiB) in {nPages} pages and {len(ItemsList)} groups")
+  if options.Smaps: print(f"{ProcessMemPath}: {FormatSmapsTotals(TotalSmaps)}")
   
   return TotalMemory
 # PrintMemoryMap()
 
 
+StructuredFormats = ( 'jsonl', 'csv', 'npy', )
+
+def MemoryMapRecords(ItemsList, options):
+  """Returns the column names and the sorted rows of numeric values of the
+  items, as in the table printed by `PrintMemoryMap()`.
+  
+  Addresses which are not defined (see `MapDataListClass.start()`) are None.
+  The `total` column holds the progressive total of size (or Rss with smaps).
+  """
+  columns = [ 'path', 'mappings', 'size', ]
+  if options.Smaps: columns.extend(SmapsFields.values())
+  if options.PrintStart: columns.append('start')
+  if options.PrintEnd: columns.append('stop')
+  
+  rows = []
+  for item in ItemsList:
+    row = [ item.path, len(item) if hasattr(item, '__len__') else 1, item.size() ]
+    if options.Smaps: row.extend(item.smapsValue(field) for field in SmapsFields)
+    if options.PrintStart: row.append(item.start())
+    if options.PrintEnd: row.append(item.stop())
+    rows.append(row)
+  # for
+  
+  ColumnOfKey = { SortKey_Size: 'size', SortKey_Start: 'start', SortKey_Path: 'path' }
+  for SortKey in reversed(options.Sort):
+    if not SortKey: continue
+    reverse = SortKey[0] in '!~-'
+    if reverse: SortKey = SortKey[1:]
+    try: sortIndex = columns.index(ColumnOfKey.get(SortKey, SortKey))
+    except ValueError: raise Exception(f"Invalid sort key: '{SortKey}'")
+    rows.sort(key=lambda r: -1 if r[sortIndex] is None else r[sortIndex],
+      reverse=not reverse)
+  # for
+  
+  iTotal = columns.index('rss' if options.Smaps else 'size')
+  ProgressiveTotal = 0
+  for row in rows:
+    ProgressiveTotal += row[iTotal]
+    row.append(ProgressiveTotal)
+  # for
+  columns.append('total')
+  return columns, rows
+# MemoryMapRecords()
+
+
+def EncodeNpyRecords(columns, rows):
+  """Returns a NumPy file with a structured array of the rows.
+  
+  Strings are stored as fixed-size unicode, numbers as 64-bit integers
+  (with -1 for undefined values).
+  """
+  formats = []
+  for iColumn, column in enumerate(columns):
+    if rows and isinstance(rows[0][iColumn], str):
+      length = max(max(len(row[iColumn]) for row in rows), 1)
+      formats.append(( column, f'<U{length}', length ))
+    else: formats.append(( column, '<i8', None ))
+  # for
+  descr = ", ".join(f"('{name}', '{fmt}')" for name, fmt, length in formats)
+  header = f"{{'descr': [{descr}], 'fortran_order': False, 'shape': ({len(rows)},), }}"
+  # total header size must be a multiple of 64, ending with a new line
+  header += ' ' * (63 - (6 + 4 + len(header)) % 64) + '\n'
+  data = bytearray(b'\x93NUMPY\x01\x00' + struct.pack('<H', len(header)))
+  data += header.encode('latin1')
+  for row in rows:
+    for value, ( name, fmt, length ) in zip(row, formats):
+      if length is None: data += struct.pack('<q', -1 if value is None else value)
+      else: data += value.ljust(length, '\0').encode('utf-32-le')
+    # for
+  # for
+  return bytes(data)
+# EncodeNpyRecords()
+
+
+CSVHeaderWritten = False
+
+def WriteMemoryMapRecords(ProcessMemPath, ItemsList, options):
+  """Writes the items with one of the `StructuredFormats`, with numeric values.
+  
+  The source map is the first column of each record; NumPy arrays of
+  different sources are written one after the other.
+  """
+  global CSVHeaderWritten
+  columns, rows = MemoryMapRecords(ItemsList, options)
+  columns = [ 'source' ] + columns
+  rows = [ [ ProcessMemPath ] + row for row in rows ]
+  if options.OutputFormat == 'jsonl':
+    for row in rows: print(json.dumps(dict(zip(columns, row))))
+  elif options.OutputFormat == 'csv':
+    writer = csv.writer(sys.stdout)
+    if not CSVHeaderWritten:
+      writer.writerow(columns)
+      CSVHeaderWritten = True
+    # if
+    writer.writerows(rows)
+  elif options.OutputFormat == 'npy':
+    sys.stdout.flush()
+    sys.stdout.buffer.write(EncodeNpyRecords(columns, rows))
+    sys.stdout.buffer.flush()
+  # if ... else
+# WriteMemoryMapRecords()
+
+
+PageSize = os.sysconf('SC_PAGE_SIZE')
+PagemapWindow = 1 << 16 # pages read from pagemap at once (512 KiB of entries)
+ResidencyMethods = ( 'auto', 'pagemap', 'mincore', )
+
+# translation tables mapping a byte to 1 if the relevant bit is set, 0 otherwise
+PresentByteTable = bytes((byte >> 7) & 1 for byte in range(256)) # pagemap bit 63
+ResidentByteTable = bytes(byte & 1 for byte in range(256))       # mincore bit 0
+
+def PagemapResidency(ProcessID, ranges):
+  """Returns the number of pages of each (begin, end) address range which are
+  present in memory, from /proc/PID/pagemap.
+  
+  Pagemap has a 64-bit entry per page, with the "present" flag in bit 63;
+  entries are read in large windows, and the flags counted on the byte
+  holding that bit.
+  """
+  iTopByte = 7 if sys.byteorder == 'little' else 0
+  counts = []
+  with open(f"/proc/{ProcessID}/pagemap", 'rb', buffering=0) as Pagemap:
+    fd = Pagemap.fileno()
+    for begin, end in ranges:
+      count = 0
+      lastPage = end // PageSize
+      for page in range(begin // PageSize, lastPage, PagemapWindow):
+        nPages = min(PagemapWindow, lastPage - page)
+        entries = os.pread(fd, 8 * nPages, 8 * page)
+        count += entries[iTopByte::8].translate(PresentByteTable).count(1)
+      # for
+      counts.append(count)
+    # for
+  # with
+  return counts
+# PagemapResidency()
+
+
+def MincoreResidency(FilePath, regions):
+  """Returns the number of pages of each (offset, size) region of the file
+  which are in the page cache, via `mincore()`.
+  
+  The file regions are mapped (without reading them) just for the query.
+  Parts of regions beyond the end of the file are not counted.
+  """
+  libc = ctypes.CDLL(None, use_errno=True)
+  libc.mincore.argtypes \
+    = [ ctypes.c_void_p, ctypes.c_size_t, ctypes.POINTER(ctypes.c_ubyte) ]
+  counts = []
+  with open(FilePath, 'rb') as MappedFile:
+    fileSize = os.fstat(MappedFile.fileno()).st_size
+    for offset, size in regions:
+      size = min(size, fileSize - offset)
+      if size <= 0:
+        counts.append(0)
+        continue
+      # if
+      region = mmap.mmap(MappedFile.fileno(), size, access=mmap.ACCESS_COPY,
+        offset=offset)
+      buffer = flags = None
+      try:
+        buffer = ctypes.c_char.from_buffer(region)
+        flags = (ctypes.c_ubyte * ((size + PageSize - 1) // PageSize))()
+        if libc.mincore(ctypes.addressof(buffer), size, flags) != 0:
+          raise OSError(ctypes.get_errno(), "mincore() failed on " + FilePath)
+        counts.append(bytes(flags).translate(ResidentByteTable).count(1))
+      finally:
+        # the mapping can't be closed while its memory is exported
+        del buffer, flags
+        region.close()
+      # try ... finally
+    # for
+  # with
+  return counts
+# MincoreResidency()
+
+
+def PrintResidency(ProcessMemPath, options):
+  """Prints which fraction of the mapped pages of each group is resident.
+  
+  With pagemap (only for running processes), a page counts if it is present
+  in the memory of the process; with mincore, if the mapped file region is
+  in the page cache (which is shared by all processes).
+  Only the groups whose path matches one of `options.ResidencyPaths` are
+  included.
+  """
+  match = re.match(r'^/proc/(\d+)/', ProcessMemPath)
+  ProcessID = int(match.group(1)) if match else None
+  method = options.ResidencyMethod
+  if method == 'auto': method = 'pagemap' if ProcessID is not None else 'mincore'
+  if method == 'pagemap' and ProcessID is None:
+    raise Exception(f"Residency from pagemap needs a process, not '{ProcessMemPath}'")
+  
+  MapTable = MapTableClass.FromFile(ProcessMemPath)
+  selected = {}
+  for i, path in enumerate(MapTable.paths):
+    if method == 'mincore' and not MapTable.inodes[i]: continue # not a file
+    if not any(fnmatch.fnmatchcase(path, pattern)
+      for pattern in options.ResidencyPaths):
+      continue
+    selected.setdefault(path, []).append(i)
+  # for
+  
+  rows = []
+  for path, indices in selected.items():
+    pages = sum((int(MapTable.ends[i]) - int(MapTable.begins[i])) // PageSize
+      for i in indices)
+    try:
+      if method == 'pagemap':
+        counts = PagemapResidency(ProcessID, [ ( int(MapTable.begins[i]),
+          int(MapTable.ends[i]) ) for i in indices ])
+      else:
+        counts = MincoreResidency(path, [ ( int(MapTable.offsets[i]),
+          int(MapTable.ends[i]) - int(MapTable.begins[i]) ) for i in indices ])
+      # if ... else
+    except OSError as e:
+      print(f"Can't query residency of '{path}': {e}", file=sys.stderr)
+      continue
+    # try ... except
+    rows.append(( sum(counts) * PageSize, pages * PageSize, path ))
+  # for
+  
+  rows.sort(reverse=True)
+  for resident, mapped, path in rows:
+    print(f"{resident//1024:10d} KiB {mapped//1024:10d} KiB"
+      f" {resident / mapped if mapped else 0.0:7.1%} | {path}")
+  # for
+  totalResident = sum(row[0] for row in rows)
+  totalMapped = sum(row[1] for row in rows)
+  print(f"{ProcessMemPath}: {totalResident/1048576:.2f} MiB resident out of"
+    f" {totalMapped/1048576:.2f} MiB mapped"
+    f" ({totalResident / totalMapped if totalMapped else 0.0:.1%})"
+    f" in {len(rows)} groups, from {method}")
+  return totalResident, totalMapped
+# PrintResidency()
+
+
+VsyscallPattern = re.compile(r'^.*\[vsyscall\]\n?', re.M)
+
+def PrintFragmentation(ProcessMemPath, options):
+  """Prints the free gaps in the address space, and how fragmented it is.
+  
+  The fragmentation index is 1 minus the ratio between the largest gap and
+  all the free space between the mappings: 0 when all the free space is in
+  a single gap, close to 1 when it is scattered in many small ones.
+  The legacy `[vsyscall]` page, fixed by the kernel far above the user address
+  space, is left out.
+  """
+  with OPEN(ProcessMemPath) as MapFile:
+    MapTable = MapTableClass(VsyscallPattern.sub('', MapFile.read()))
+  if len(MapTable) == 0:
+    print(f"{ProcessMemPath}: no mappings.")
+    return None
+  # if
+  
+  gaps = MapTable.holes()
+  lowest, highest = int(min(MapTable.begins)), int(max(MapTable.ends))
+  mapped = MapTable.totalSize()
+  free = sum(stop - start for start, stop, before, after in gaps)
+  HoleSize = lambda gap: gap[1] - gap[0]
+  fragmentation = (1.0 - HoleSize(max(gaps, key=HoleSize)) / free) if free else 0.0
+  largest = heapq.nlargest(options.HolesCount, gaps, key=HoleSize)
+  
+  print(f"{ProcessMemPath}: {len(MapTable)} mappings in 0x{lowest:x}-0x{highest:x}"
+    f" ({(highest - lowest)/1048576:.2f} MiB), {mapped/1048576:.2f} MiB mapped,"
+    f" {free/1048576:.2f} MiB free in {len(gaps)} holes;"
+    f" fragmentation index {fragmentation:.3f}")
+  
+  if largest:
+    print(f"Largest {len(largest)} holes:")
+    for start, stop, before, after in largest:
+      print(f"{(stop - start)//1024:12d} KiB {PadStringLeft(f'0x{start:x}', 18)}"
+        f" {PadStringLeft(f'0x{stop:x}', 18)} | after '{MapTable.paths[before]}',"
+        f" before '{MapTable.paths[after]}'")
+    # for
+  # if
+  
+  print("Groups by unmapped space (span, mapped, holes, mapped fraction,"
+    " mappings | path):")
+  for group in sorted(MapTable.groups(), key=lambda g: g.hole(), reverse=True):
+    span = group.span()
+    print(f"{span//1024:12d} KiB {group.size()//1024:10d} KiB"
+      f" {group.hole()//1024:10d} KiB {group.size() / span if span else 1.0:7.1%}"
+      f" {len(group):6d} | {group.path}")
+  # for
+  
+  return fragmentation
+# PrintFragmentation()
+
+
+def FormatSmapsTotals(Totals):
+  return ", ".join(f"{field} {Totals.get(field, 0)/1048576:.2f} MiB"
+    for field in SmapsFields)
+# FormatSmapsTotals()
+
+
+def PrintMemoryTotals(ProcessSmapsPath):
+  """Prints the total of the smaps fields.
+  
+  A `smaps_rollup` file holds only the totals, precomputed by the kernel;
+  `smaps` files are summed instead.
+  """
+  Totals = dict.fromkeys(SmapsFields, 0)
+  for MemPage in ReadMemoryMap(ProcessSmapsPath):
+    for field in Totals: Totals[field] += MemPage.smapsValue(field)
+  print(f"{ProcessSmapsPath}: {FormatSmapsTotals(Totals)}")
+  return Totals
+# PrintMemoryTotals()
+
+
+def ReadMapEntries(ProcessMemPath, options):
+  """Returns a list of (path, dev, inode, offset, size, Rss, Pss) of each
+  mapping in the map file.
+  
+  This is a lighter parser than `ReadMemoryMap()`, for the survey of many
+  processes (Rss and Pss are 0 unless `options.Smaps` is set).
+  """
+  if options.Smaps:
+    return [
+      ( page.path, page.dev, page.inode, page.offset, page.size(),
+        page.smapsValue('Rss'), page.smapsValue('Pss'), )
+      for page in ReadMemoryMap(ProcessMemPath)
+      ]
+  # if smaps
+  with open(ProcessMemPath) as MapFile: content = MapFile.read()
+  return [
+    ( path, dev, int(inode), offset, int(end, 16) - int(begin, 16), 0, 0, )
+    for begin, end, perms, offset, dev, inode, path
+    in MapLinePattern.findall(content)
+    ]
+# ReadMapEntries()
+
+
+SurveyPatternPattern = re.compile(r'^[0-9*?\[\]!-]+$') # process ID or pattern
+
+def FindProcesses(Patterns):
+  """Returns the IDs of the running processes matching any of the patterns."""
+  return sorted(int(name) for name in os.listdir('/proc') if name.isdigit()
+    and any(fnmatch.fnmatchcase(name, pattern) for pattern in Patterns))
+# FindProcesses()
+
+
+def SurveyMemoryMaps(ProcessIDs, options):
+  """Prints the memory mapped by all the processes, grouped by path.
+  
+  The maps are read in parallel threads. Mappings of the same file region
+  (same device, inode, offset and size) in different processes are counted
+  only once in the "unique" total; anonymous mappings are never shared.
+  """
+  MapFileName = 'smaps' if options.Smaps else 'maps'
+  
+  def ReadProcess(ProcessID):
+    try: return ReadMapEntries(f"/proc/{ProcessID}/{MapFileName}", options)
+    except (OSError, ValueError): return None # process gone or not ours
+  # ReadProcess()
+  
+  with ThreadPoolExecutor() as pool:
+    ProcessEntries = list(pool.map(ReadProcess, ProcessIDs))
+  
+  # per path: processes, mappings, total size, unique size, Rss, Pss
+  Groups = {}
+  SeenRegions = set()
+  nProcesses = 0
+  for ProcessID, entries in zip(ProcessIDs, ProcessEntries):
+    if entries is None: continue
+    nProcesses += 1
+    for path, dev, inode, offset, size, rss, pss in entries:
+      try: group = Groups[path]
+      except KeyError: group = Groups[path] = [ set(), 0, 0, 0, 0, 0 ]
+      group[0].add(ProcessID)
+      group[1] += 1
+      group[2] += size
+      region = ( dev, inode, offset, size ) if inode else None
+      if region is None or region not in SeenRegions:
+        group[3] += size
+        if region is not None: SeenRegions.add(region)
+      # if new region
+      group[4] += rss
+      group[5] += pss
+    # for
+  # for
+  
+  sortIndex = 5 if options.Smaps else 3
+  Rows = sorted(Groups.items(), key=lambda item: item[1][sortIndex], reverse=True)
+  for path, ( pids, nMaps, total, unique, rss, pss ) in Rows:
+    Items = [ f"{unique//1024:10d} KiB", f"{total//1024:10d} KiB" ]
+    if options.Smaps: Items += [ f"{rss//1024:10d} KiB", f"{pss//1024:10d} KiB" ]
+    Items += [ f"{len(pids):6d}", f"{nMaps:7d}", "|", path ]
+    print(" ".join(Items))
+  # for
+  
+  TotalUnique = sum(group[3] for group in Groups.values())
+  print(f"{nProcesses} processes ({len(ProcessIDs) - nProcesses} not readable):"
+    f" {TotalUnique} bytes ({TotalUnique/1048576:.2f} MiB) unique mapped memory"
+    f" in {len(Groups)} paths")
+  if options.Smaps:
+    print("Columns: unique size, total size, Rss, Pss, processes, mappings, path")
+  else:
+    print("Columns: unique size, total size, processes, mappings, path")
+  return TotalUnique
+# SurveyMemoryMaps()
+
+
+class MemoryMapWatcher:
+  """Samples a memory map repeatedly, tracking the size of each group.
+  
+  Mappings from lines which did not change since the previous sample are
+  reused rather than parsed again.
+  """
+  def __init__(self, ProcessMemPath, options):
+    self.path = ProcessMemPath
+    self.group = not options.DontGroup
+    # with smaps, the tracked size is the resident one
+    self.measure = (lambda item: item.smapsValue('Rss')) if options.Smaps \
+      else (lambda item: item.size())
+    self.cache = {}
+    self.sizes = None
+    self.sampleTime = None
+  # __init__()
+  
+  def sample(self):
+    """Reads the memory map again.
+    
+    Returns the total memory, the time elapsed since the previous sample and
+    a list of (group, old size, new size) for the groups which changed size
+    (groups not present in one of the samples have size 0 there).
+    """
+    now = time.monotonic()
+    MemPages = ReadMemoryMap(self.path, self.cache)
+    if self.group:
+      sizes = { path: self.measure(group)
+        for path, group in GroupMemoryMap(MemPages).items() }
+    else:
+      sizes = { f"{page.address} {page.path}": self.measure(page)
+        for page in MemPages }
+    # if ... else
+    
+    if self.sizes is None: changes, elapsed = [], None
+    else:
+      changes = [ ( key, self.sizes.get(key, 0), size )
+        for key, size in sizes.items() if size != self.sizes.get(key, 0) ]
+      changes.extend( ( key, size, 0 )
+        for key, size in self.sizes.items() if key not in sizes )
+      elapsed = now - self.sampleTime
+    # if ... else
+    self.sizes, self.sampleTime = sizes, now
+    return sum(sizes.values()), elapsed, changes
+  # sample()
+  
+# class MemoryMapWatcher
+
+
+def Sampling(options):
+  """Yields the index of each sample, at the time it is due.
+  
+  There is only one sample unless `options.Watch` is set, in which case
+  samples follow every `options.Watch` seconds, up to `options.Samples`.
+  """
+  nextSample = time.monotonic()
+  iSample = 0
+  while True:
+    yield iSample
+    iSample += 1
+    if options.Watch is None: break
+    if options.Samples and iSample >= options.Samples: break
+    nextSample += options.Watch
+    time.sleep(max(nextSample - time.monotonic(), 0))
+  # while
+# Sampling()
+
+
+def PrintSizeChanges(changes, elapsed = None):
+  """Prints (key, old size, new size) changes, the largest first."""
+  changes.sort(key=lambda change: abs(change[2] - change[1]), reverse=True)
+  for key, oldSize, newSize in changes:
+    delta = newSize - oldSize
+    rate = f" {delta/1024/elapsed:+10.1f} KiB/s" if elapsed else ""
+    print(f"{newSize//1024:8d} KiB {delta//1024:+8d} KiB{rate} | {key}")
+  # for
+# PrintSizeChanges()
+
+
+def WatchMemoryMaps(ProcessMemPaths, options):
+  """Prints the changes in the memory maps every `options.Watch` seconds."""
+  Watchers = [ MemoryMapWatcher(path, options) for path in ProcessMemPaths ]
+  Totals = {}
+  for iSample in Sampling(options):
+    if not Watchers: break
+    for watcher in list(Watchers):
+      try: total, elapsed, changes = watcher.sample()
+      except (OSError, ProcessLookupError):
+        print(f"{watcher.path}: no longer available.")
+        Watchers.remove(watcher)
+        continue
+      # try ... except
+      stamp = time.strftime("%H:%M:%S")
+      if elapsed is None:
+        print(f"[{stamp}] {watcher.path}: {total} bytes ({total/1048576:.2f} MiB)"
+          f" in {len(watcher.sizes)} groups; watching every {options.Watch:g} s")
+      elif changes:
+        delta = total - Totals[watcher.path]
+        print(f"[{stamp}] {watcher.path}: {total} bytes ({total/1048576:.2f} MiB),"
+          f" {delta//1024:+d} KiB ({delta/1024/elapsed:+.1f} KiB/s)")
+        PrintSizeChanges(changes, elapsed)
+      # if ... else
+      Totals[watcher.path] = total
+    # for
+  # for samples
+# WatchMemoryMaps()
+
+
+################################################################################
+### snapshot archive
+###
+### The archive is a sequence of gzip members, each holding one or more
+### snapshot records. A record is a varint length followed by:
+###   magic, kind (0: full, 1: delta), time (double), source, flags (1: smaps),
+###   number of mappings, string table, and a list of operations
+###   (varint `count << 2 | code`):
+###   COPY  the next `count` mappings of the previous snapshot of the same
+###         source (followed, with smaps, by the zigzag changes of their
+###         smaps values);
+###   SKIP  the next `count` mappings of the previous snapshot;
+###   NEW   `count` mappings, each as: zigzag distance of the begin address
+###         from the end of the previous mapping, size, perms, offset, dev,
+###         inode, path (strings as indices in the string table) and, with
+###         smaps, the smaps values in KiB.
+### A full record is a delta from an empty snapshot; the first snapshot of a
+### source in each capture session is a full one.
+###
+SnapshotMagic = b'\x89AMM'
+SnapshotOp_Copy, SnapshotOp_Skip, SnapshotOp_New = range(3)
+SnapshotFlag_Smaps = 1
+
+def AppendVarint(buf, value):
+  while value >= 0x80:
+    buf.append((value & 0x7F) | 0x80)
+    value >>= 7
+  # while
+  buf.append(value)
+# AppendVarint()
+
+def ReadVarint(data, pos):
+  value = shift = 0
+  while True:
+    byte = data[pos]
+    pos += 1
+    value |= (byte & 0x7F) << shift
+    if not byte & 0x80: return value, pos
+    shift += 7
+  # while
+# ReadVarint()
+
+def ZigZag(value): return 2 * value if value >= 0 else -2 * value - 1
+def UnZigZag(value): return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+
+class SnapshotClass:
+  """A memory map at a given time.
+  
+  Each entry is a tuple (begin, end, perms, offset, dev, inode, path, Rss,
+  Pss, Private_Dirty, Swap), with the smaps values in bytes (0 if unknown).
+  """
+  __slots__ = ( 'time', 'source', 'smaps', 'entries', )
+  
+  StaticFields = 7 # the fields identifying a mapping
+  
+  def __init__(self, time, source, smaps, entries):
+    self.time = time
+    self.source = source
+    self.smaps = smaps
+    self.entries = entries
+  # __init__()
+  
+  def groupSizes(self, field = None):
+    """Returns path -> total size (or smaps `field`) of the mappings."""
+    iValue = 7 + list(SmapsFields).index(field) if field else None
+    sizes = {}
+    for entry in self.entries:
+      value = entry[iValue] if iValue else entry[1] - entry[0]
+      sizes[entry[6]] = sizes.get(entry[6], 0) + value
+    # for
+    return sizes
+  # groupSizes()
+  
+  @staticmethod
+  def Capture(ProcessMemPath):
+    MemPages = ReadMemoryMap(ProcessMemPath)
+    return SnapshotClass(time.time(), ProcessMemPath,
+      any(page.smaps for page in MemPages),
+      [ ( page.begin, page.end, page.perms, page.offset, page.dev, page.inode,
+          page.path ) + tuple(page.smapsValue(field) for field in SmapsFields)
+        for page in MemPages ]
+      )
+  # Capture()
+  
+# class SnapshotClass
+
+
+def EncodeSnapshot(snapshot, previous = None):
+  """Returns the archive record of the snapshot, as delta from `previous`."""
+  nStatic = SnapshotClass.StaticFields
+  prevEntries = previous.entries if previous else []
+  # operations: lists [ code, count, entries ]
+  ops = []
+  j = 0
+  for entry in snapshot.entries:
+    # previous mappings before this one which did not survive unchanged
+    while j < len(prevEntries) and prevEntries[j][0] <= entry[0] \
+      and prevEntries[j][:nStatic] != entry[:nStatic]:
+      if ops and ops[-1][0] == SnapshotOp_Skip: ops[-1][1] += 1
+      else: ops.append([ SnapshotOp_Skip, 1, None ])
+      j += 1
+    # while
+    if j < len(prevEntries) and prevEntries[j][:nStatic] == entry[:nStatic]:
+      code, item = SnapshotOp_Copy, ( prevEntries[j], entry )
+      j += 1
+    else: code, item = SnapshotOp_New, entry
+    if ops and ops[-1][0] == code:
+      ops[-1][1] += 1
+      ops[-1][2].append(item)
+    else: ops.append([ code, 1, [ item ] ])
+  # for
+  
+  strings = {}
+  def StringIndex(s): return strings.setdefault(s, len(strings))
+  body = bytearray()
+  lastEnd = 0
+  for code, count, items in ops:
+    AppendVarint(body, (count << 2) | code)
+    if code == SnapshotOp_Skip: continue
+    for item in items:
+      if code == SnapshotOp_Copy:
+        old, entry = item
+        if snapshot.smaps:
+          for oldValue, value in zip(old[nStatic:], entry[nStatic:]):
+            AppendVarint(body, ZigZag((value - oldValue) // 1024))
+        # if smaps
+      else:
+        begin, end, perms, offset, dev, inode, path = item[:nStatic]
+        AppendVarint(body, ZigZag(begin - lastEnd))
+        AppendVarint(body, end - begin)
+        AppendVarint(body, StringIndex(perms))
+        AppendVarint(body, offset)
+        AppendVarint(body, StringIndex(dev))
+        AppendVarint(body, inode)
+        AppendVarint(body, StringIndex(path))
+        if snapshot.smaps:
+          for value in item[nStatic:]: AppendVarint(body, value // 1024)
+        # if smaps
+      # if ... else
+      lastEnd = item[1][1] if code == SnapshotOp_Copy else item[1]
+    # for items
+  # for ops
+  
+  record = bytearray(SnapshotMagic)
+  record.append(0 if previous is None else 1)
+  record += struct.pack('<d', snapshot.time)
+  source = snapshot.source.encode()
+  AppendVarint(record, len(source))
+  record += source
+  AppendVarint(record, SnapshotFlag_Smaps if snapshot.smaps else 0)
+  AppendVarint(record, len(snapshot.entries))
+  AppendVarint(record, len(strings))
+  for s in strings:
+    encoded = s.encode()
+    AppendVarint(record, len(encoded))
+    record += encoded
+  # for
+  record += body
+  
+  framed = bytearray()
+  AppendVarint(framed, len(record))
+  return bytes(framed + record)
+# EncodeSnapshot()
+
+
+def DecodeSnapshots(data):
+  """Returns the list of all the snapshots in the decompressed archive data."""
+  nStatic = SnapshotClass.StaticFields
+  nSmaps = len(SmapsFields)
+  snapshots = []
+  last = {} # last snapshot of each source
+  pos = 0
+  while pos < len(data):
+    length, pos = ReadVarint(data, pos)
+    end = pos + length
+    if data[pos:pos + len(SnapshotMagic)] != SnapshotMagic:
+      raise RuntimeError(f"Snapshot #{len(snapshots)} is corrupted.")
+    pos += len(SnapshotMagic)
+    kind = data[pos]
+    snapshotTime, = struct.unpack_from('<d', data, pos + 1)
+    pos += 9
+    n, pos = ReadVarint(data, pos)
+    source = bytes(data[pos:pos + n]).decode()
+    pos += n
+    flags, pos = ReadVarint(data, pos)
+    smaps = bool(flags & SnapshotFlag_Smaps)
+    nEntries, pos = ReadVarint(data, pos)
+    nStrings, pos = ReadVarint(data, pos)
+    strings = []
+    for i in range(nStrings):
+      n, pos = ReadVarint(data, pos)
+      strings.append(bytes(data[pos:pos + n]).decode())
+      pos += n
+    # for
+    
+    if kind == 0: prevEntries = []
+    elif source in last: prevEntries = last[source].entries
+    else:
+      raise RuntimeError(f"Snapshot #{len(snapshots)} of '{source}' is"
+        " a delta, but the previous snapshot is missing.")
+    entries = []
+    j = 0
+    lastEnd = 0
+    while len(entries) < nEntries:
+      op, pos = ReadVarint(data, pos)
+      code, count = op & 3, op >> 2
+      if code == SnapshotOp_Skip:
+        j += count
+        continue
+      for i in range(count):
+        if code == SnapshotOp_Copy:
+          entry = prevEntries[j]
+          j += 1
+          if smaps:
+            values = []
+            for oldValue in entry[nStatic:]:
+              delta, pos = ReadVarint(data, pos)
+              values.append(oldValue + UnZigZag(delta) * 1024)
+            # for
+            entry = entry[:nStatic] + tuple(values)
+          # if smaps
+        else:
+          fields = []
+          for i in range(nStatic + (nSmaps if smaps else 0)):
+            value, pos = ReadVarint(data, pos)
+            fields.append(value)
+          # for
+          begin = lastEnd + UnZigZag(fields[0])
+          entry = ( begin, begin + fields[1], strings[fields[2]], fields[3],
+            strings[fields[4]], fields[5], strings[fields[6]], ) \
+            + (tuple(value * 1024 for value in fields[nStatic:])
+              if smaps else (0,) * nSmaps)
+        # if ... else
+        entries.append(entry)
+        lastEnd = entry[1]
+      # for
+    # while
+    if pos != end:
+      raise RuntimeError(f"Snapshot #{len(snapshots)} is corrupted.")
+    snapshot = SnapshotClass(snapshotTime, source, smaps, entries)
+    snapshots.append(snapshot)
+    last[source] = snapshot
+  # while
+  return snapshots
+# DecodeSnapshots()
+
+
+def CaptureSnapshots(ProcessMemPaths, ArchivePath, options):
+  """Appends snapshots of the memory maps to the archive, once per sample.
+  
+  Snapshots are stored as differences from the previous one of the same
+  source, including the last one already in the archive, if any.
+  """
+  previous = {}
+  if os.path.exists(ArchivePath):
+    try:
+      with gzip.open(ArchivePath, 'rb') as Archive:
+        for snapshot in DecodeSnapshots(Archive.read()):
+          previous[snapshot.source] = snapshot
+    except (OSError, EOFError, RuntimeError, IndexError) as e:
+      print(f"Can't read the snapshots in '{ArchivePath}' ({e}):"
+        " new snapshots will be stored in full.", file=sys.stderr)
+      previous = {}
+    # try ... except
+  # if archive exists
+  nSnapshots = 0
+  for iSample in Sampling(options):
+    records = []
+    for path in ProcessMemPaths:
+      try: snapshot = SnapshotClass.Capture(path)
+      except OSError: continue # process gone
+      base = previous.get(path)
+      if base is not None and base.smaps != snapshot.smaps: base = None
+      records.append(EncodeSnapshot(snapshot, base))
+      previous[path] = snapshot
+    # for
+    if not records: break
+    with gzip.open(ArchivePath, 'ab') as Archive: Archive.write(b''.join(records))
+    nSnapshots += len(records)
+  # for
+  print(f"{nSnapshots} snapshots added to '{ArchivePath}'.")
+  return nSnapshots
+# CaptureSnapshots()
+
+
+def DiffMain(argv):
+  """The `diff` subcommand: compares two snapshots from an archive."""
+  Parser = argparse.ArgumentParser(prog=os.path.basename(sys.argv[0]) + " diff",
+    description="Compares two snapshots from an archive, group by group.")
+  Parser.add_argument("Archive", help="snapshot archive (see --snapshot)")
+  Parser.add_argument("From", nargs='?', type=int, default=0,
+    help="index of the first snapshot (negative from the end) [%(default)s]")
+  Parser.add_argument("To", nargs='?', type=int, default=-1,
+    help="index of the second snapshot (negative from the end) [%(default)s]")
+  Parser.add_argument("--list", "-l", dest="List", action="store_true",
+    help="lists the snapshots in the archive")
+  Parser.add_argument("--field", dest="Field", choices=list(SmapsFields),
+    default=None, help="compares this smaps field instead of the mapped size")
+  args = Parser.parse_args(argv)
+  
+  with gzip.open(args.Archive, 'rb') as Archive:
+    snapshots = DecodeSnapshots(Archive.read())
+  
+  if args.List:
+    for iSnapshot, snapshot in enumerate(snapshots):
+      total = sum(entry[1] - entry[0] for entry in snapshot.entries)
+      stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot.time))
+      print(f"{iSnapshot:4d} [{stamp}] {snapshot.source}:"
+        f" {len(snapshot.entries)} mappings, {total/1048576:.2f} MiB"
+        + (" (smaps)" if snapshot.smaps else ""))
+    # for
+    return 0
+  # if list
+  
+  try: first, second = snapshots[args.From], snapshots[args.To]
+  except IndexError:
+    print(f"Archive '{args.Archive}' has only {len(snapshots)} snapshots.",
+      file=sys.stderr)
+    return 1
+  # try
+  if args.Field and not (first.smaps and second.smaps):
+    print(f"Field {args.Field} is not available in the selected snapshots.",
+      file=sys.stderr)
+    return 1
+  # if
+  
+  oldSizes, newSizes = first.groupSizes(args.Field), second.groupSizes(args.Field)
+  changes = [ ( key, oldSizes.get(key, 0), newSizes.get(key, 0) )
+    for key in set(oldSizes).union(newSizes)
+    if oldSizes.get(key, 0) != newSizes.get(key, 0) ]
+  oldTotal, newTotal = sum(oldSizes.values()), sum(newSizes.values())
+  elapsed = second.time - first.time
+  print(f"{first.source} -> {second.source} ({elapsed:.1f} s):"
+    f" {newTotal} bytes ({newTotal/1048576:.2f} MiB),"
+    f" {(newTotal - oldTotal)//1024:+d} KiB")
+  PrintSizeChanges(changes, elapsed if elapsed > 0 else None)
+  return 0
+# DiffMain()
+
+
 ################################################################################
 if __name__ == "__main__":
   
+  if len(sys.argv) > 1 and sys.argv[1] == 'diff': sys.exit(DiffMain(sys.argv[2:]))
+  
   Parser = argparse.ArgumentParser(description=__doc__)
   
-  Parser.add_argument("PIDorMaps", nargs='+',
-    help="one or more process IDs or map files")
+  Parser.add_argument("PIDorMaps", nargs='*',
+    help="one or more process IDs or map files; process ID patterns"
+    " with wildcards (e.g. '12*') survey all the matching processes"
+    " (together with any plain process ID, but no map file)")
   
   Parser.add_argument("-G", "--nogroup", dest="DontGroup", action="store_true",
     help="do not group the pages by node" )
@@ -267,6 +1382,49 @@ if __name__ == "__main__":
     default=[], help="sorts by the specified item ('help' for a list)" )
   Parser.add_argument("--unsorted", dest="DontSort", action="store_true",
     default=[], help="do not sort the entries at all" )
+  Parser.add_argument("--output-format", "-O", dest="OutputFormat",
+    choices=[ 'table', ] + list(StructuredFormats), default='table',
+    help="output format of the map: human-readable table, or records with"
+    " numeric values in JSON lines, CSV or NumPy (npy) format (not available"
+    " with --totals, --holes, --residency, --all, --watch, --snapshot)"
+    " [%(default)s]" )
+  Parser.add_argument("--smaps", dest="Smaps", action="store_true",
+    help="reads smaps, and reports resident (Rss), proportional (Pss),"
+    " private dirty and swapped memory" )
+  Parser.add_argument("--totals", dest="Totals", action="store_true",
+    help="prints only the total resident memory of each process"
+    " (from smaps_rollup when available); implies --smaps" )
+  Parser.add_argument("--holes", dest="Holes", action="store_true",
+    help="prints a fragmentation report with the largest holes"
+    " in the address space" )
+  Parser.add_argument("--holes-count", dest="HolesCount", type=int,
+    default=10, metavar="N",
+    help="with --holes, number of largest holes to list [%(default)s]" )
+  Parser.add_argument("--residency", dest="Residency", action="store_true",
+    help="prints the fraction of mapped memory of each group which is"
+    " resident" )
+  Parser.add_argument("--residency-method", dest="ResidencyMethod",
+    choices=ResidencyMethods, default='auto',
+    help="with --residency, uses the process pagemap or, for files only, the"
+    " page cache via mincore() ('auto' uses pagemap for running processes)"
+    " [%(default)s]" )
+  Parser.add_argument("--residency-path", dest="ResidencyPaths", action="append",
+    default=[], metavar="PATTERN",
+    help="with --residency, includes only groups with path matching this"
+    " pattern (may be repeated) ['/*', all the files]" )
+  Parser.add_argument("--all", "-a", dest="All", action="store_true",
+    help="surveys the maps of all the processes, grouped by path" )
+  Parser.add_argument("--snapshot", dest="Snapshot", default=None,
+    metavar="ARCHIVE",
+    help="appends a snapshot of the maps (smaps with --smaps) to ARCHIVE;"
+    " with --watch, a snapshot per sample; each snapshot is stored as the"
+    " difference from the previous one of the same process in the archive" )
+  Parser.add_argument("--watch", dest="Watch", type=float, default=None,
+    metavar="INTERVAL",
+    help="samples the maps every INTERVAL seconds, printing the groups"
+    " which changed size" )
+  Parser.add_argument("--samples", dest="Samples", type=int, default=None,
+    help="in watch mode, stops after this many samples" )
   Parser.add_argument("--version", "-v", action="version",
     version='%(prog)s ' + __version__)
   
@@ -282,14 +1440,69 @@ if __name__ == "__main__":
     sys.exit(1)
   # if
   
-  if not args.DontSort and not args.Sort: args.Sort = [ DefaultSort ]
+  if args.Totals: args.Smaps = True
+  if not args.ResidencyPaths: args.ResidencyPaths = [ '/*' ]
+  if not args.DontSort and not args.Sort:
+    args.Sort = [ DefaultSmapsSort if args.Smaps else DefaultSort ]
+  # if
+  
+  if args.HolesCount < 0:
+    Parser.error("the number of holes to list (--holes-count) can't be negative")
+  
+  if args.Watch is not None and args.Watch <= 0:
+    print("The watch interval must be positive.", file=sys.stderr)
+    sys.exit(1)
+  # if
+  
+  PIDpatterns = [ spec for spec in args.PIDorMaps if any(c in spec for c in '*?[') ]
+  
+  if args.OutputFormat != 'table':
+    # structured formats are available only for the memory map itself
+    TableOnlyModes = [ mode for mode, enabled in (
+      ( '--totals', args.Totals ), ( '--holes', args.Holes ),
+      ( '--residency', args.Residency ),
+      ( '--all or process ID patterns', args.All or PIDpatterns ),
+      ( '--watch', args.Watch is not None ), ( '--snapshot', args.Snapshot ),
+      ) if enabled ]
+    if TableOnlyModes:
+      Parser.error(f"--output-format {args.OutputFormat} is not supported with "
+        + ", ".join(TableOnlyModes))
+    # if
+  # if structured output
+  if args.All or PIDpatterns:
+    if args.Watch is not None or args.Totals:
+      print("Survey mode does not support --watch nor --totals.", file=sys.stderr)
+      sys.exit(1)
+    # if
+    # process IDs are included in the survey (as patterns matching only
+    # themselves); map files, or file name patterns, can't be surveyed
+    if args.All and args.PIDorMaps:
+      Parser.error("--all surveys all the processes: no process ID nor map"
+        " file can be specified")
+    # if
+    NotProcesses = [ spec for spec in args.PIDorMaps
+      if not SurveyPatternPattern.match(spec) ]
+    if NotProcesses:
+      Parser.error("survey mode (process ID patterns) can't include map files: '"
+        + "', '".join(NotProcesses) + "'")
+    # if
+    SurveyMemoryMaps(FindProcesses(args.PIDorMaps if not args.All else [ '*' ]),
+      args)
+    sys.exit(0)
+  # if survey
+  if not args.PIDorMaps:
+    Parser.error("a process ID or map file is needed (or --all)")
   
   nErrors = 0
+  WatchedPaths = []
   for ProcessSpec in args.PIDorMaps:
     
     try:
       ProcessID = int(ProcessSpec)
       ProcessMemMapFile = '/proc/%d/maps' % ProcessID
+      if args.Smaps: ProcessMemMapFile = '/proc/%d/smaps' % ProcessID
+      if args.Totals and os.path.exists('/proc/%d/smaps_rollup' % ProcessID):
+        ProcessMemMapFile = '/proc/%d/smaps_rollup' % ProcessID
     except ValueError:
       ProcessMemMapFile = ProcessSpec
     
@@ -299,8 +1512,16 @@ if __name__ == "__main__":
       continue
     # if no mem file
     
+    if args.Watch is not None or args.Snapshot:
+      WatchedPaths.append(ProcessMemMapFile)
+      continue
+    # if watch or snapshot
+    
     try:
-      PrintMemoryMap(ProcessMemMapFile, args)
+      if args.Totals: PrintMemoryTotals(ProcessMemMapFile)
+      elif args.Holes: PrintFragmentation(ProcessMemMapFile, args)
+      elif args.Residency: PrintResidency(ProcessMemMapFile, args)
+      else: PrintMemoryMap(ProcessMemMapFile, args)
     except Exception as e:
       print(f"Caught exception while processing '{ProcessMemMapFile}':\n{str(e)}",
         file=sys.stderr)
@@ -310,5 +1531,12 @@ if __name__ == "__main__":
     # try ... except
   # for
   
+  if WatchedPaths:
+    try:
+      if args.Snapshot: CaptureSnapshots(WatchedPaths, args.Snapshot, args)
+      else: WatchMemoryMaps(WatchedPaths, args)
+    except KeyboardInterrupt: pass
+  # if watch
+  
   sys.exit(max(nErrors, 1))
 # main
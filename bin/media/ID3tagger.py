@@ -15,6 +15,9 @@
 #   added --pause option
 # 20240605 [v1.4]
 #   added pattern-based parsing and renaming
+# 20261019 [v1.5]
+#   added --execute mode, writing the tags directly;
+#   streaming processing of the input
 #
 
 __doc__ = """Creates a script assigning ID3 tags to MP3 files.
@@ -57,18 +60,28 @@ The rename key will change the name of the underlying file to the one specified
 by the rename value. The value is subject to tag replacement (see the paragraph
 above). If the target name is already used by another file, the program will
 immediately interrupt with an error.
+
+With `--execute`, instead of a script the tags are written directly into the
+files (ID3v2.3, or the existing ID3v2.4 tag, keeping all other frames), and
+the files are renamed; many files are processed at the same time (`--jobs`).
+In this mode `--pause` is ignored.
 """
-__version__ = "1.4"
+__version__ = "1.5"
 
 
 import sys
 import os
 import os.path
 import logging
-import copy
 import math
 import re
 import shlex
+import functools
+import collections
+import errno
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 
 
 class EmptyObject: pass
@@ -218,6 +231,7 @@ class ID3GenresClass:
   # Match()
   
   @staticmethod
+  @functools.lru_cache(maxsize=None) # the same few values come again and again
   def GenreID(key):
     try: key = int(key)
     except ValueError: key = str(key).lower()
@@ -285,18 +299,322 @@ class BashQuoterClass:
 # class BashQuoterClass
 
 
+class ID3v2TagClass:
+   """ID3v2 tag (version 2.3 or 2.4) of a file, kept as a list of raw frames.
+   
+   Only the frames being set are decoded and encoded; all the others are
+   written back byte by byte as they were read.
+   """
+   
+   HeaderSize = 10
+   NewTagPadding = 2048 # padding of a tag when the file needs to be rewritten
+   
+   Codecs = { 0: 'latin-1', 1: 'utf-16', 2: 'utf-16-be', 3: 'utf-8', }
+   
+   def __init__(self, path):
+      self.path = path
+      self.version = 3
+      self.size = 0 # size of the tag in the file (without header); 0 if none
+      self.frames = [] # ( frame ID, flags, data ) for each frame
+      with open(path, 'rb') as TagFile: self.parse(TagFile)
+   # __init__()
+   
+   @staticmethod
+   def DecodeSyncSafe(b):
+      return (b[0] << 21) | (b[1] << 14) | (b[2] << 7) | b[3]
+   
+   @staticmethod
+   def EncodeSyncSafe(n):
+      return bytes((n >> shift) & 0x7F for shift in ( 21, 14, 7, 0, ))
+   
+   def decodeSize(self, b):
+      if self.version >= 4: return ID3v2TagClass.DecodeSyncSafe(b)
+      else:                 return int.from_bytes(b, 'big')
+   # decodeSize()
+   
+   def encodeSize(self, n):
+      if self.version >= 4: return ID3v2TagClass.EncodeSyncSafe(n)
+      else:                 return n.to_bytes(4, 'big')
+   # encodeSize()
+   
+   
+   def parse(self, TagFile):
+      header = TagFile.read(ID3v2TagClass.HeaderSize)
+      if len(header) < ID3v2TagClass.HeaderSize or not header.startswith(b'ID3'):
+         return # no tag yet
+      version, flags = header[3], header[5]
+      if version not in ( 3, 4, ):
+         raise RuntimeError(f"'{self.path}': ID3v2.{version} tags are not supported")
+      if flags & 0x90:
+         raise RuntimeError(f"'{self.path}': unsynchronised tags or tags with"
+           " footer are not supported")
+      # if
+      self.version = version
+      self.size = ID3v2TagClass.DecodeSyncSafe(header[6:10])
+      body = TagFile.read(self.size)
+      if len(body) < self.size:
+         raise RuntimeError(f"'{self.path}': truncated ID3v2 tag")
+      
+      pos = 0
+      if flags & 0x40: # extended header (dropped when writing)
+         if version >= 4: pos = ID3v2TagClass.DecodeSyncSafe(body[0:4])
+         else:            pos = 4 + int.from_bytes(body[0:4], 'big')
+      # if
+      while pos + 10 <= len(body) and body[pos] != 0: # padding starts with 0
+         start = pos + 10
+         end = start + self.decodeSize(body[pos+4:pos+8])
+         self.frames.append(
+           ( body[pos:pos+4].decode('latin-1'), body[pos+8:start], body[start:end], )
+           )
+         pos = end
+      # while
+   # parse()
+   
+   
+   def encodeStrings(self, *texts):
+      """Returns the encoding byte followed by the terminated strings."""
+      if self.version >= 4: encoding = 3
+      else:
+         try:
+            for text in texts: text.encode('latin-1')
+            encoding = 0
+         except UnicodeEncodeError: encoding = 1
+      # if ... else
+      terminator = b'\0\0' if encoding in ( 1, 2, ) else b'\0'
+      codec = ID3v2TagClass.Codecs[encoding]
+      return bytes(( encoding, )) \
+        + terminator.join(text.encode(codec) for text in texts)
+   # encodeStrings()
+   
+   
+   @staticmethod
+   def CommentDescription(data):
+      encoding = data[0]
+      if encoding in ( 1, 2, ): # terminator must be aligned to 2 bytes
+         end = 4
+         while end + 1 < len(data) and data[end:end+2] != b'\0\0': end += 2
+      else:
+         end = data.find(b'\0', 4)
+      # if ... else
+      return data[4:end].decode(ID3v2TagClass.Codecs.get(encoding, 'latin-1'),
+        errors='replace')
+   # CommentDescription()
+   
+   
+   def replaceFrame(self, matches, frame):
+      """Replaces the first frame `matches` selects, and removes the others."""
+      iFrame = None
+      for i, ( frameID, flags, data ) in enumerate(self.frames):
+         if not matches(frameID, data): continue
+         if iFrame is None: iFrame = i
+         self.frames[i] = None
+      # for
+      if iFrame is None: self.frames.append(frame)
+      else:              self.frames[iFrame] = frame
+      self.frames = [ frame for frame in self.frames if frame is not None ]
+   # replaceFrame()
+   
+   def setText(self, frameID, text):
+      self.replaceFrame(lambda ID, data: ID == frameID,
+        ( frameID, b'\0\0', self.encodeStrings(text), ))
+   # setText()
+   
+   def setComment(self, description, text, language=b'XXX'):
+      data = self.encodeStrings(description, text)
+      self.replaceFrame(
+        lambda ID, data: ID == 'COMM'
+          and ID3v2TagClass.CommentDescription(data) == description,
+        ( 'COMM', b'\0\0', data[:1] + language + data[1:], )
+        )
+   # setComment()
+   
+   
+   def render(self):
+      return b''.join(
+        frameID.encode('latin-1') + self.encodeSize(len(data)) + flags + data
+        for frameID, flags, data in self.frames
+        )
+   # render()
+   
+   def header(self, size):
+      return b'ID3' + bytes(( self.version, 0, 0, )) \
+        + ID3v2TagClass.EncodeSyncSafe(size)
+   # header()
+   
+   def write(self) -> "whether the tag was written in place":
+      """Writes the tag into the file.
+      
+      If the new frames fit into the space of the existing tag, only the tag
+      is overwritten. Otherwise the whole file is rewritten into a temporary
+      file with a larger padding, which then atomically replaces the original.
+      """
+      frames = self.render()
+      if self.size and len(frames) <= self.size:
+         with open(self.path, 'r+b') as TagFile:
+            TagFile.write(self.header(self.size) + frames
+              + bytes(self.size - len(frames)))
+         # with
+         return True
+      # if in place
+      
+      size = len(frames) + ID3v2TagClass.NewTagPadding
+      fd, TempPath = tempfile.mkstemp(dir=os.path.dirname(self.path) or '.',
+        prefix='.' + os.path.basename(self.path) + '.', suffix='.tagging')
+      try:
+         with os.fdopen(fd, 'wb') as NewFile, open(self.path, 'rb') as OldFile:
+            NewFile.write(self.header(size) + frames + bytes(size - len(frames)))
+            if self.size: OldFile.seek(ID3v2TagClass.HeaderSize + self.size)
+            shutil.copyfileobj(OldFile, NewFile, 1 << 20)
+            NewFile.flush()
+            os.fsync(NewFile.fileno())
+         # with
+         shutil.copymode(self.path, TempPath)
+         os.replace(TempPath, self.path)
+      except BaseException:
+         if os.path.exists(TempPath): os.unlink(TempPath)
+         raise
+      # try ... except
+      self.size = size
+      return False
+   # write()
+   
+# class ID3v2TagClass
+
+
+def RenameWithoutOverwriting(SourcePath, TargetPath):
+   """Renames a file, failing with `FileExistsError` if the target exists.
+   
+   The new name is created as a hard link (which can't overwrite anything)
+   and then the old one is removed; where hard links are not supported,
+   the existence of the target is checked before a plain rename.
+   """
+   try:
+      os.link(SourcePath, TargetPath)
+   except FileExistsError: raise
+   except OSError:
+      if os.path.lexists(TargetPath):
+         raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), TargetPath)
+      os.rename(SourcePath, TargetPath)
+      return
+   # try ... except
+   os.unlink(SourcePath)
+# RenameWithoutOverwriting()
+
+
+class ItemRecordClass:
+   """Immutable record of the parsing state for one file.
+   
+   Values are shared with the state they were taken from (and so with the
+   records of the other files of the same album), not copied.
+   Supports the read-only part of the dictionary interface, with missing
+   entries represented by `None`.
+   """
+   __slots__ = (
+      'InputFile', 'Album', 'Artist', 'Genre', 'Year', 'Title', 'TrackNo',
+      'NTracks', 'FilePattern', 'TitlePattern', 'Rename', 'Comments',
+   )
+   
+   def __init__(self, state):
+      for key in ItemRecordClass.__slots__:
+         object.__setattr__(self, key, state.get(key, None))
+   # __init__()
+   
+   def __setattr__(self, key, value):
+      raise AttributeError("Item records can't be modified")
+   
+   def get(self, key, default = None):
+      value = getattr(self, key, None)
+      return default if value is None else value
+   # get()
+   
+   def __getitem__(self, key):
+      value = self.get(key)
+      if value is None: raise KeyError(key)
+      return value
+   # __getitem__()
+   
+   def __contains__(self, key): return self.get(key) is not None
+   
+   def comments(self):
+      """Returns the list of comments, in the order they were added."""
+      comments = []
+      chain = self.Comments
+      while chain is not None:
+         comment, chain = chain
+         comments.append(comment)
+      # while
+      comments.reverse()
+      return comments
+   # comments()
+   
+# class ItemRecordClass
+
+
 class ProcessorClass:
+   
+   TagOptions = {
+      'Album': '--album', 'Artist': '--artist', 'Year': '--year',
+      'Title': '--song', 'Genre': '--genre', 'Track': '--track',
+   }
+   TagFrames = {
+      'Album': 'TALB', 'Artist': 'TPE1', 'Year': 'TYER',
+      'Title': 'TIT2', 'Genre': 'TCON', 'Track': 'TRCK',
+   }
+   
    def __init__(self, options = None):
       self.state = {
          'FilePattern': re.compile('.*'),
          'TitlePattern': re.compile('.*'),
       }
-      self.output = []
       self.commentKeys = set()
       self.baseDirectory = ''
       self.pause = options.PauseTime if options else 0.0
    # __init__()
    
+   @staticmethod
+   def SplitSpec(spec) -> "( key, value ), or None if no content":
+      spec = spec.strip();
+      
+      # empty line
+      if not spec: return None
+      
+      # support full line comments
+      if spec.startswith('#'): return None
+      
+      # if no colon is found, then we assume it's the file path
+      try:
+         key, value = map(str.strip, spec.split(':', 1))
+         key = key.lower()
+      except ValueError:
+         key = "file"
+         value = spec
+      #
+      return key, value
+   # SplitSpec()
+   
+   
+   @staticmethod
+   def CountItems(InputSpecs) -> "number of files, None if it can't tell":
+      """Counts the files in the specifications, then rewinds them.
+      
+      Returns `None` without reading anything if the input is not seekable.
+      """
+      try:
+         if not InputSpecs.seekable(): return None
+      except AttributeError: return None
+      start = InputSpecs.tell()
+      nItems = 0
+      for spec in InputSpecs: # a quicker version of `SplitSpec()`
+         spec = spec.strip()
+         if not spec or spec.startswith('#'): continue
+         key, colon, value = spec.partition(':')
+         if not colon or key.strip().lower() == "file": nItems += 1
+      # for
+      InputSpecs.seek(start)
+      return nItems
+   # CountItems()
+   
+   
    def ParseFile(self, InputSpecs):
       
       try:
@@ -311,27 +629,15 @@ class ProcessorClass:
    
    
    def Parse(self, InputSpecs):
+      """Generator yielding a record for each file, as soon as it's complete."""
       
       for iLine, spec in enumerate(InputSpecs):
-         spec = spec.strip();
-         
-         # empty line
-         if not spec: continue
-         
-         # support full line comments
-         if spec.startswith('#'): continue
-         
-         # if no colon is found, then we assume it's the file path
-         try:
-            key, value = map(str.strip, spec.split(':', 1))
-            key = key.lower()
-         except ValueError:
-            key = "file"
-            value = spec
-         #
+         keyValue = ProcessorClass.SplitSpec(spec)
+         if keyValue is None: continue
+         key, value = keyValue
          
          if key == "file":
-            if 'InputFile' in self.state: self.OutputCurrent()
+            if 'InputFile' in self.state: yield self.CurrentItem()
             self.state['InputFile'] = os.path.join(self.baseDirectory, value)
             continue
          # if file
@@ -361,17 +667,20 @@ class ProcessorClass:
                  f"of '{self.state.get('InputFile', '<starting file>')}' ('{value}'): {e}") from e
             break
          else: # a comment?
-            self.state.setdefault('Comments', []).append("%s:%s" % (key, value))
+            # comments pile up: a chain ( last, previous chain ) shares all
+            # the previous ones with the records which already have them
+            self.state['Comments'] \
+              = ( "%s:%s" % (key, value), self.state.get('Comments', None), )
          # if ...
       # for
       
-      if 'InputFile' in self.state: self.OutputCurrent()
+      if 'InputFile' in self.state: yield self.CurrentItem()
       
    # Parse()
    
-   def OutputCurrent(self):
-      self.output.append(copy.deepcopy(self.state))
-   # OutputCurrent()
+   def CurrentItem(self):
+      return ItemRecordClass(self.state)
+   # CurrentItem()
    
    
    def ValidateComment(self, comment):
@@ -409,7 +718,8 @@ class ProcessorClass:
    # ExtractTags()
    
    
-   def OutputElement(self, item, iElem, nElem):
+   def ElementTags(self, item, iElem, nElem):
+      """Returns file path, list of ( tag, value ), comments and new name."""
       try:
          InputFile = item['InputFile']
       except KeyError:
@@ -417,27 +727,16 @@ class ProcessorClass:
       
       tagValues = self.ExtractTags(item)
       
-      cmds = []
-      
-      cmd = [ "id3v2" ]
-      
-      for key, option in (
-        ( 'Album', '--album' ),
-        ( 'Artist', '--artist' ),
-        ( 'Year', '--year' ),
-        ( 'Title', '--song' ),
-        ):
-         try:
-            cmd.extend((option, item[key] ))
-         except KeyError: pass
-      # for
+      tags = [ ( key, item[key] )
+        for key in ( 'Album', 'Artist', 'Year', 'Title', ) if key in item ]
       
       Genre = item.get('Genre', None)
       if Genre:
          GenreName = ID3GenresClass.Genre(Genre)
          if not GenreName:
             logging.warning("Unknown genre for '%s': '%s'", InputFile, Genre)
-         cmd.extend(('--genre', GenreName, ))
+         else:
+            tags.append(( 'Genre', GenreName, ))
       # if
       
       iTrack = item.get('TrackNo', iElem + 1)
@@ -445,16 +744,12 @@ class ProcessorClass:
          iTrack, nTracks = map(int, iTrack.split('/', 1))
       except (ValueError, AttributeError, ):
          nTracks = item.get('NTracks', nElem)
-      cmd.extend(( '--track', "%s/%s" % (str(iTrack), str(nTracks)), ))
-      
-      for comment in item.get('Comments', []):
-         self.ValidateComment(comment)
-         cmd.extend(( '--comment', comment, ))
-      # for
+      tags.append(( 'Track', "%s/%s" % (str(iTrack), str(nTracks)), ))
       
-      cmd.append(InputFile)
-      cmds.append(BashQuoterClass.QuoteList(cmd))
+      comments = [ self.ValidateComment(comment)
+        for comment in item.comments() ]
       
+      NewName = None
       if 'Rename' in item:
          try:
             NewName = item['Rename'].format(**tagValues)
@@ -463,13 +758,32 @@ class ProcessorClass:
                "Tag '%s' is not available; '%s' won't be renamed. Available patterns:\n%s",
                str(e), InputFile, "\n".join(f" - '{t}' ('{v}')" for t, v in tagValues.items()),
                )
-         else:
-            # attempt to overwrite is failure
-            cmds.append(
-               BashQuoterClass.QuoteWords
-                 ( 'mv', '-v', '--update=none-fail', InputFile, NewName)
-                 + [ '||', 'exit', '$?' ]
-               )
+      # if rename request
+      
+      return InputFile, tags, comments, NewName
+   # ElementTags()
+   
+   
+   def OutputElement(self, item, iElem, nElem):
+      InputFile, tags, comments, NewName \
+        = self.ElementTags(item, iElem, nElem)
+      
+      cmds = []
+      
+      cmd = [ "id3v2" ]
+      for key, value in tags: cmd.extend(( ProcessorClass.TagOptions[key], value ))
+      for key, value in comments:
+         cmd.extend(( '--comment', "%s:%s" % (key, value), ))
+      cmd.append(InputFile)
+      cmds.append(BashQuoterClass.QuoteList(cmd))
+      
+      if NewName is not None:
+         # attempt to overwrite is failure
+         cmds.append(
+            BashQuoterClass.QuoteWords
+              ( 'mv', '-v', '--update=none-fail', InputFile, NewName)
+              + [ '||', 'exit', '$?' ]
+            )
       # if rename request
       
       return cmds
@@ -477,9 +791,90 @@ class ProcessorClass:
    # OutputElement()
    
    
-   def Output(self, OutputFile):
-      items = self.output
-      nItems = len(items)
+   @staticmethod
+   def TagElement(InputFile, tags, comments):
+      """Writes the tags into the file; returns a report, `None` on failure."""
+      try:
+         tag = ID3v2TagClass(InputFile)
+         for key, value in tags:
+            frameID = ProcessorClass.TagFrames[key]
+            if key == 'Year' and tag.version >= 4: frameID = 'TDRC'
+            tag.setText(frameID, value)
+         # for
+         for key, value in comments: tag.setComment(key, value)
+         inPlace = tag.write()
+      except (RuntimeError, OSError) as e:
+         logging.error("Failed to tag '%s': %s", InputFile, e)
+         return None
+      # try ... except
+      return "tagged '{}'{}".format(InputFile, "" if inPlace else " (rewritten)")
+   # TagElement()
+   
+   
+   def Execute(self, items, nItems, nJobs = None):
+      """Tags and renames all the files directly, tagging with `nJobs` threads.
+      
+      Files are submitted for tagging as the items come, keeping only a
+      limited number of them waiting for a thread. Items are completed in
+      input order, each with its renaming done here, after its tagging:
+      renames happen in the same sequence as in the script. A file is not
+      submitted for tagging while a pending item is still tagging it, or
+      one of the pending renames involves it.
+      """
+      Padding = len(str(nItems))
+      nDone = 0
+      nFailed = 0
+      pending = collections.deque() # ( future, input file, new name )
+      
+      def CompleteFirst():
+         nonlocal nDone, nFailed
+         future, InputFile, NewName = pending.popleft()
+         report = future.result()
+         if report is None: nFailed += 1
+         # like the script, rename even if tagging failed
+         if NewName is not None:
+            RenameWithoutOverwriting(InputFile, NewName)
+            report = (report or "failed to tag '{}'".format(InputFile)) \
+              + " and renamed into '{}'".format(NewName)
+         # if
+         nDone += 1
+         if report is not None:
+            print("[{0:0{2}d}/{1:0{2}d}] {3}".format(nDone, nItems, Padding, report))
+      # CompleteFirst()
+      
+      def BusyPaths():
+         return { os.path.abspath(path) for future, InputFile, NewName in pending
+           for path in ( InputFile, NewName, ) if path is not None }
+      # BusyPaths()
+      
+      with ThreadPoolExecutor(max_workers=nJobs) as Executor:
+         maxPending = 4 * (nJobs or os.cpu_count() or 1)
+         try:
+            for iItem, item in enumerate(items):
+               InputFile, tags, comments, NewName \
+                 = self.ElementTags(item, iItem, nItems)
+               while pending and (len(pending) >= maxPending
+                 or os.path.abspath(InputFile) in BusyPaths()):
+                  CompleteFirst()
+               # while
+               pending.append(( Executor.submit(ProcessorClass.TagElement,
+                 InputFile, tags, comments), InputFile, NewName, ))
+            # for
+            while pending: CompleteFirst()
+         except BaseException:
+            # e.g. renaming would overwrite a file: stop everything
+            Executor.shutdown(wait=True, cancel_futures=True)
+            raise
+         # try ... except
+      # with
+      if nFailed: logging.error("%d/%d files could not be tagged.", nFailed, nItems)
+      
+      return nDone - nFailed
+   # Execute()
+   
+   
+   def Output(self, OutputFile, items, nItems):
+      """Prints the script for each of the items as soon as it comes."""
       Padding = len(str(nItems))
       PreviousAlbum = None
       for iItem, item in enumerate(items):
@@ -512,7 +907,6 @@ class ProcessorClass:
       # for
       cmd = [ 'echo', "Done." ]
       
-      self.output = []
       return nItems
    # Output()
    
@@ -525,9 +919,17 @@ def Process(InputFile, OutputFile, options):
    
    Processor = ProcessorClass(options)
    
-   Processor.ParseFile(InputFile)
+   # the total is needed first (default track total, progress);
+   # if the input can't be read twice, items are collected
+   nItems = ProcessorClass.CountItems(InputFile)
+   items = Processor.ParseFile(InputFile)
+   if nItems is None:
+      items = list(items)
+      nItems = len(items)
+   # if
    
-   nCommands = Processor.Output(OutputFile)
+   if options.Execute: nTagged = Processor.Execute(items, nItems, options.Jobs)
+   else:               nCommands = Processor.Output(OutputFile, items, nItems)
    
    logging.info("%d comment types found: '%s'", len(Processor.commentKeys),
      "', '".join(Processor.commentKeys))
@@ -538,6 +940,64 @@ def Process(InputFile, OutputFile, options):
 
 if __name__ == "__main__":
    
+   if '--test' in sys.argv:
+      sys.argv.remove('--test')
+      import unittest, tempfile, threading, time
+      
+      class ExecuteTests(unittest.TestCase):
+         
+         def testDuplicateEntries(self):
+            """The same file listed twice is never tagged by two threads at once."""
+            active = set()
+            overlaps = []
+            lock = threading.Lock()
+            TagElement = ProcessorClass.TagElement
+            def TrackedTagElement(InputFile, tags, comments):
+               with lock:
+                  if InputFile in active: overlaps.append(InputFile)
+                  active.add(InputFile)
+               # with
+               try:
+                  time.sleep(0.05)
+                  return TagElement(InputFile, tags, comments)
+               finally:
+                  with lock: active.discard(InputFile)
+            # TrackedTagElement()
+            
+            with tempfile.TemporaryDirectory() as workDir:
+               SpecPath = os.path.join(workDir, 'list.txt')
+               with open(SpecPath, 'w') as SpecFile:
+                  SpecFile.write("album: A\n")
+                  for name, title in (
+                    ( 'a.mp3', 'first' ), ( 'b.mp3', 'other' ), ( 'a.mp3', 'second' ),
+                    ):
+                     with open(os.path.join(workDir, name), 'wb') as AudioFile:
+                        AudioFile.write(b'\xff\xfb' * 100)
+                     SpecFile.write("{}\ntitle: {}\n".format(name, title))
+                  # for
+               # with
+               
+               ProcessorClass.TagElement = staticmethod(TrackedTagElement)
+               try:
+                  Processor = ProcessorClass()
+                  with open(SpecPath) as SpecFile:
+                     items = list(Processor.ParseFile(SpecFile))
+                  Processor.Execute(items, len(items), nJobs=4)
+               finally: ProcessorClass.TagElement = staticmethod(TagElement)
+               
+               self.assertEqual(overlaps, [])
+               tag = ID3v2TagClass(os.path.join(workDir, 'a.mp3'))
+               titles = [ data for frameID, flags, data in tag.frames
+                 if frameID == 'TIT2' ]
+               self.assertEqual(titles, [ b'\0second' ])
+            # with
+         # testDuplicateEntries()
+         
+      # class ExecuteTests
+      
+      unittest.main()
+   # if tests
+   
    import argparse
    
    parser = argparse.ArgumentParser(
@@ -552,8 +1012,16 @@ if __name__ == "__main__":
    parser.add_argument('--genres', action='store_true', dest='ListGenres',
      help="List all supported genres")
    parser.add_argument('--pause', action='store', dest='PauseTime', type=float,
-     help="waits for this number of seconds after each tagging [%(default]",
+     help="waits for this number of seconds after each tagging [%(default)s]",
      default=0.0)
+   parser.add_argument('--execute', '-x', action='store_true', dest='Execute',
+     help="writes the tags and renames the files directly, instead of"
+     " printing a script")
+   parser.add_argument('--jobs', '-j', action='store', dest='Jobs', type=int,
+     help="with --execute, number of files tagged at the same time"
+     " [default: automatic]", default=None)
+   parser.add_argument('--test', action='store_true',
+     help="runs the unit tests instead")
    parser.add_argument('--version', action='version',
      version='%(prog)s v' + __version__)
    
@@ -564,6 +1032,9 @@ if __name__ == "__main__":
      sys.exit(0)
    # if list genres
 
+   if arguments.Execute and arguments.OutputFile is not None:
+      parser.error("--output can't be used with --execute")
+   
    if not arguments.InputFiles: arguments.InputFiles = [ "" ]
    
    if arguments.OutputFile is None: OutputFile = sys.stdout